@@ -1,5 +1,27 @@
+import logging
+
 from django.apps import AppConfig
+from django.core import checks
+
+logger = logging.getLogger('manifest_loader')
 
 
 class ManifestLoader(AppConfig):
     name = 'manifest_loader'
+
+    def ready(self):
+        from manifest_loader.checks import check_manifest
+        checks.register(check_manifest)
+        # reports memory gauges to the instrumentation hooks on reloads
+        from manifest_loader import memory  # noqa: F401
+        from manifest_loader.storage import sync_local_copies
+        from manifest_loader.utils import APP_SETTINGS, _get_config
+        sync_local_copies(_get_config(namespace) for namespace
+                          in [None, *APP_SETTINGS['manifests']])
+        from manifest_loader.reload import install_signal_handlers
+        try:
+            install_signal_handlers()
+        except ValueError:
+            # signal handlers can only be installed from the main thread
+            logger.warning('The reload_signals setting is ignored outside '
+                           'of the main thread')
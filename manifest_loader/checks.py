@@ -0,0 +1,42 @@
+from django.core.checks import Error
+
+from manifest_loader.exceptions import WebpackManifestNotFound
+from manifest_loader.loaders import LoaderABC
+from manifest_loader.utils import APP_SETTINGS, _get_config, _get_manifest
+
+
+def check_manifest(app_configs, **kwargs):
+    """
+    Verifies the loader setting and, in strict mode, that the manifest can be
+    found and parsed, so a broken deploy fails before serving any request.
+    """
+    errors = []
+    for namespace in [None, *APP_SETTINGS['manifests']]:
+        errors.extend(_check_namespace(namespace))
+    return errors
+
+
+def _check_namespace(namespace):
+    config = _get_config(namespace)
+    label = 'manifest' if namespace is None else \
+        'manifest {!r}'.format(namespace)
+
+    loader = config['loader']
+    if not (isinstance(loader, type) and issubclass(loader, LoaderABC)):
+        return [Error(
+            'The loader for the {} must inherit from '
+            'manifest_loader.loaders.LoaderABC'.format(label),
+            id='manifest_loader.E001',
+        )]
+
+    if not config['strict']:
+        return []
+
+    try:
+        _get_manifest(namespace)
+    except WebpackManifestNotFound as error:
+        return [Error(str(error), id='manifest_loader.E002')]
+    except ValueError as error:
+        return [Error('The {} is not valid JSON: {}'.format(label, error),
+                      id='manifest_loader.E003')]
+    return []
@@ -0,0 +1,8 @@
+from manifest_loader.utils import ManifestAssets
+
+
+def assets(request):
+    """
+    Adds ``assets``, a lazy mapping of manifest keys to urls, to the context.
+    """
+    return {'assets': ManifestAssets(request)}
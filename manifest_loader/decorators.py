@@ -0,0 +1,29 @@
+from functools import wraps
+
+from django.views.decorators.cache import cache_page
+
+from manifest_loader.lru import LRUCache
+from manifest_loader.utils import manifest_key_prefix
+
+
+def manifest_cache_page(timeout, *, cache=None, key_prefix='',
+                        namespace=None):
+    """
+    Works like Django's ``cache_page``, with the version of the manifest
+    added to the cache key prefix, so cached pages are invalidated when the
+    manifest changes rather than pointing at deleted assets.
+    """
+    def decorator(view):
+        views = LRUCache(4)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            prefix = manifest_key_prefix(key_prefix, namespace)
+            cached_view = views.get(prefix)
+            if cached_view is None:
+                cached_view = cache_page(timeout, cache=cache,
+                                         key_prefix=prefix)(view)
+                views.set(prefix, cached_view)
+            return cached_view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,111 @@
+import hashlib
+import http.client
+import json
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+from manifest_loader.exceptions import WebpackManifestNotFound
+
+logger = logging.getLogger('manifest_loader')
+
+_dev_servers = {}
+_dev_servers_lock = threading.Lock()
+
+
+def get_dev_server_manifest(url, interval=1.0, timeout=5.0):
+    """
+    Returns a ``(manifest, version)`` tuple for the manifest served by a
+    webpack-dev-server at ``url``, see ``DevServerManifest``.
+    """
+    with _dev_servers_lock:
+        dev_server = _dev_servers.get(url)
+        if dev_server is None:
+            dev_server = _dev_servers[url] = DevServerManifest(url, interval,
+                                                               timeout)
+    return dev_server.get()
+
+
+class DevServerManifest:
+    """
+    Fetches a manifest over HTTP from a webpack-dev-server, which keeps it in
+    memory rather than writing it to disk. The connection is kept alive
+    between requests, requests are conditional on the last ``ETag``, and the
+    server is asked at most once every ``interval`` seconds.
+    """
+    def __init__(self, url, interval=1.0, timeout=5.0):
+        parts = urlsplit(url)
+        self.url = url
+        self.interval = interval
+        self.timeout = timeout
+        self.scheme = parts.scheme
+        self.netloc = parts.netloc
+        self.path = parts.path or '/'
+        if parts.query:
+            self.path += '?' + parts.query
+        self.data = None
+        self.version = None
+        self.etag = None
+        self.checked = None
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """returns the manifest and its version, refreshing it if it's due"""
+        with self._lock:
+            now = time.monotonic()
+            if self.data is not None and \
+                    now - self.checked < self.interval:
+                return self.data, self.version
+            self.checked = now
+            try:
+                self._refresh()
+            except (OSError, http.client.HTTPException, ValueError) as error:
+                self.close()
+                if self.data is None:
+                    raise WebpackManifestNotFound(self.url) from error
+                logger.warning('Refreshing the manifest from %s failed: %s',
+                               self.url, error)
+            return self.data, self.version
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _refresh(self):
+        headers = {}
+        if self.etag and self.data is not None:
+            headers['If-None-Match'] = self.etag
+        response = self._request(headers)
+        body = response.read()
+        if response.status == 304:
+            return
+        if response.status != 200:
+            raise http.client.HTTPException(
+                'unexpected status {}'.format(response.status))
+        self.data = json.loads(body)
+        self.version = hashlib.blake2b(body, digest_size=8).hexdigest()
+        self.etag = response.getheader('ETag')
+        if response.will_close:
+            self.close()
+
+    def _request(self, headers):
+        """
+        sends a GET over the kept-alive connection, reconnecting once if the
+        server closed it in the meantime
+        """
+        for attempt in range(2):
+            if self._connection is None:
+                connection_class = http.client.HTTPSConnection \
+                    if self.scheme == 'https' else http.client.HTTPConnection
+                self._connection = connection_class(self.netloc,
+                                                    timeout=self.timeout)
+            try:
+                self._connection.request('GET', self.path, headers=headers)
+                return self._connection.getresponse()
+            except (ConnectionError, http.client.CannotSendRequest):
+                self.close()
+                if attempt:
+                    raise
@@ -0,0 +1,74 @@
+import re
+
+from manifest_loader.lru import LRUCache
+from manifest_loader.utils import APP_SETTINGS
+
+# browsers by User-Agent token, with the first major version that runs
+# module scripts and honours nomodule, or None when no version does. The
+# first token found decides, so browsers whose User-Agent also names the
+# one they are built on come first.
+_BROWSERS = [
+    (re.compile(r'MSIE |Trident/|Opera Mini|Presto/'), None),
+    (re.compile(r'Edge/(\d+)'), 16),
+    (re.compile(r'OPR/(\d+)'), 48),
+    (re.compile(r'SamsungBrowser/(\d+)'), 9),
+    (re.compile(r'(?:Chrome|Chromium|CriOS)/(\d+)'), 61),
+    (re.compile(r'(?:Firefox|FxiOS)/(\d+)'), 60),
+    (re.compile(r'Version/(\d+)[\d.]* (?:Mobile/\S+ |Mobile )?Safari/'),
+     11),
+]
+
+# User-Agent -> True for legacy browsers
+_ua_cache = LRUCache(APP_SETTINGS['ua_cache_size'])
+
+
+def differential_resolver(context, namespace):
+    """
+    A ``resolver`` picking the legacy build of a manifest for browsers that
+    can't run module scripts, by applying the ``legacy_overrides`` setting of
+    the manifest, or the top level one. Each build is cached separately, so
+    choosing one costs a lookup in the User-Agent LRU once per request.
+    """
+    request = context.get('request') if context is not None else None
+    if request is None or not is_legacy_client(request):
+        return None
+    if namespace is not None:
+        return APP_SETTINGS['manifests'][namespace].get(
+            'legacy_overrides', APP_SETTINGS['legacy_overrides'])
+    return APP_SETTINGS['legacy_overrides']
+
+
+def is_legacy_client(request):
+    """
+    Returns True when the browser making the request can't run module
+    scripts, judging from its Client Hints or User-Agent. Unknown browsers
+    are assumed to be modern.
+    """
+    try:
+        return request._manifest_legacy
+    except AttributeError:
+        pass
+    # only browsers that run module scripts send Client Hints
+    if 'HTTP_SEC_CH_UA' in request.META:
+        legacy = False
+    else:
+        legacy = classify_user_agent(request.META.get('HTTP_USER_AGENT', ''))
+    request._manifest_legacy = legacy
+    return legacy
+
+
+def classify_user_agent(user_agent):
+    """returns True for the User-Agent of a legacy browser, memoized"""
+    legacy = _ua_cache.get(user_agent)
+    if legacy is None:
+        legacy = _classify(user_agent)
+        _ua_cache.set(user_agent, legacy)
+    return legacy
+
+
+def _classify(user_agent):
+    for pattern, minimum in _BROWSERS:
+        match = pattern.search(user_agent)
+        if match is not None:
+            return minimum is None or int(match.group(1)) < minimum
+    return False
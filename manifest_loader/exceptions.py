@@ -11,3 +11,10 @@ class CustomManifestLoaderNotValid(Exception):
                                'must inherit from '
                                'manifest_loader.loaders.LoaderABC'):
         super().__init__(message)
+
+
+class ManifestKeyNotFound(Exception):
+    def __init__(self, key, message='Key {!r} not found in the manifest. '
+                                    'Either the key is misspelled or you '
+                                    'still need to rebuild your assets.'):
+        super().__init__(message.format(key))
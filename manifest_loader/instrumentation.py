@@ -0,0 +1,60 @@
+import threading
+import time
+
+_hooks = []
+_hooks_lock = threading.Lock()
+
+
+def add_hook(hook):
+    """
+    Registers ``hook(kind, name, value)`` to be called with the measurements
+    taken by manifest_loader. ``kind`` is ``'timing'`` for the seconds spent
+    in a phase of a lookup, named ``'load'``, ``'match'``, ``'resolve'`` or
+    ``'escape'``, and ``'gauge'`` for the bytes held in memory, named
+    ``'memory.<section>'``, see ``manifest_loader.memory.emit_gauges``.
+    """
+    with _hooks_lock:
+        _hooks.append(hook)
+
+
+def remove_hook(hook):
+    with _hooks_lock:
+        _hooks.remove(hook)
+
+
+def enabled():
+    """returns True when at least one hook is registered"""
+    return bool(_hooks)
+
+
+def emit(kind, name, value):
+    """calls every registered hook with the measurement"""
+    for hook in tuple(_hooks):
+        hook(kind, name, value)
+
+
+class _Timer:
+    def __init__(self):
+        self.last = time.perf_counter()
+
+    def lap(self, phase):
+        """emits the time spent since the previous lap as the named phase"""
+        now = time.perf_counter()
+        emit('timing', phase, now - self.last)
+        self.last = now
+
+
+class _NullTimer:
+    def lap(self, phase):
+        pass
+
+
+_null_timer = _NullTimer()
+
+
+def timer():
+    """
+    returns a timer whose ``lap(phase)`` reports to the hooks, or a timer
+    that does nothing when no hooks are registered
+    """
+    return _Timer() if enabled() else _null_timer
@@ -1,4 +1,7 @@
 import fnmatch
+import functools
+import posixpath
+import re
 from abc import ABCMeta, abstractmethod
 
 
@@ -13,6 +16,23 @@ class LoaderABC(metaclass=ABCMeta):
     def get_multi_match(manifest, pattern):
         pass
 
+    @staticmethod
+    def is_missing(manifest, key, value):
+        """
+        Returns True when ``value``, as returned by ``get_single_match``, means
+        that ``key`` was not found in the manifest.
+        """
+        return value == key and key not in manifest
+
+    @staticmethod
+    def transform(manifest):
+        """
+        Returns the manifest reshaped for the lookup methods. Called once per
+        manifest version when the manifest is loaded, so loaders for nested
+        formats can flatten them here instead of on every lookup.
+        """
+        return manifest
+
 
 class DefaultLoader(LoaderABC):
     @staticmethod
@@ -21,6 +41,150 @@ class DefaultLoader(LoaderABC):
 
     @staticmethod
     def get_multi_match(manifest, pattern):
-        matched_files = [file for file in manifest.keys() if
-                         fnmatch.fnmatch(file, pattern)]
-        return [manifest.get(file) for file in matched_files]
\ No newline at end of file
+        matches = compile_patterns(pattern)
+        matched_files = [file for file in manifest.keys() if matches(file)]
+        return list(dict.fromkeys(manifest.get(file) for file in
+                                  matched_files))
+
+
+class BundlerLoader(DefaultLoader):
+    """
+    Base for loaders of bundlers other than webpack. ``transform`` turns the
+    bundler's manifest into the flat mapping ``DefaultLoader`` reads, see
+    ``entries``, and adds aliases: keys and values are normalized by
+    stripping the ``prefixes``, and every entry with a source file can also
+    be looked up by its source path.
+    """
+    prefixes = ('./', 'static/')
+
+    @classmethod
+    def normalize(cls, path):
+        """strips leading slashes and the prefixes from the path"""
+        path = path.lstrip('/')
+        stripped = True
+        while stripped:
+            stripped = False
+            for prefix in cls.prefixes:
+                if path.startswith(prefix):
+                    path, stripped = path[len(prefix):], True
+        return path
+
+    @classmethod
+    def transform(cls, manifest):
+        flat, aliases = {}, {}
+        for name, source, output in cls.entries(manifest):
+            output = cls.normalize(output)
+            flat.setdefault(cls.normalize(name), output)
+            if source:
+                aliases.setdefault(cls.normalize(source), output)
+        for alias, output in aliases.items():
+            flat.setdefault(alias, output)
+        return flat
+
+    @classmethod
+    def get_single_match(cls, manifest, key):
+        value = manifest.get(key)
+        if value is None:
+            value = manifest.get(cls.normalize(key), key)
+        return value
+
+    @staticmethod
+    @abstractmethod
+    def entries(manifest):
+        """
+        Yields ``(name, source, output)`` for every file in the manifest,
+        where ``name`` is the key to look the output up by, e.g. ``main.js``,
+        and ``source`` the optional path of the source file it was built from.
+        """
+        pass
+
+
+class EsbuildLoader(BundlerLoader):
+    """
+    Reads the metafile written by esbuild's ``metafile`` option. Entry points
+    are keyed by their name with the extension of their output, e.g.
+    ``main.js`` and ``main.css`` for the css bundle of ``src/main.ts``, and
+    other outputs by their path.
+    """
+    @staticmethod
+    def entries(manifest):
+        for output, meta in manifest.get('outputs', {}).items():
+            entry_point = meta.get('entryPoint')
+            if entry_point:
+                yield _entry_name(entry_point, output), entry_point, output
+                if meta.get('cssBundle'):
+                    yield _entry_name(entry_point, meta['cssBundle']), None, \
+                        meta['cssBundle']
+            else:
+                yield output, None, output
+
+
+class RollupLoader(BundlerLoader):
+    """
+    Reads the manifest written by Vite's ``build.manifest`` option, which
+    maps source paths of Rollup chunks to their ``file`` and ``css``. Chunks
+    are keyed by their name with the extension of their output, e.g.
+    ``main.js``, and by their source path.
+    """
+    @staticmethod
+    def entries(manifest):
+        for source, chunk in manifest.items():
+            output = chunk['file']
+            name = chunk.get('name') or posixpath.basename(
+                posixpath.splitext(source)[0])
+            yield name + posixpath.splitext(output)[1], source, output
+            for css in chunk.get('css', ()):
+                yield name + '.css', None, css
+
+
+class ParcelLoader(BundlerLoader):
+    """
+    Reads the manifest written by ``parcel-reporter-bundle-manifest``, which
+    maps source paths to the urls of their bundles. Bundles are keyed by the
+    file name of their source with the extension of their output, e.g.
+    ``main.js`` for ``src/main.ts``, and by their source path.
+    """
+    @staticmethod
+    def entries(manifest):
+        for source, output in manifest.items():
+            yield _entry_name(source, output), source, output
+
+
+def _entry_name(source, output):
+    """returns the name of the source file with the extension of the output"""
+    return posixpath.splitext(posixpath.basename(source))[0] + \
+        posixpath.splitext(output)[1]
+
+
+@functools.lru_cache(maxsize=256)
+def _compile(patterns):
+    include, exclude = [], []
+    for pattern in patterns:
+        parts = include
+        if pattern.startswith('!'):
+            parts, pattern = exclude, pattern[1:]
+        if pattern.startswith('re:'):
+            parts.append(r'(?s:.*?)(?:{})'.format(pattern[3:]))
+        else:
+            parts.append(fnmatch.translate(pattern))
+    include_re = re.compile('|'.join(include)) if include else None
+    exclude_re = re.compile('|'.join(exclude)) if exclude else None
+
+    def matches(key):
+        return include_re is not None and \
+            include_re.match(key) is not None and \
+            (exclude_re is None or exclude_re.match(key) is None)
+    return matches
+
+
+def compile_patterns(patterns):
+    """
+    Compiles one pattern, or a list of them, into a single function that
+    returns True for keys matching any of the include patterns and none of
+    the exclude patterns. Patterns are ``fnmatch`` globs, a leading ``!``
+    makes a pattern exclude keys and a leading ``re:`` makes it a regular
+    expression searched for in the key, e.g. ``['*.css', '!re:print|rtl']``.
+    """
+    if isinstance(patterns, str):
+        patterns = (patterns,)
+    return _compile(tuple(patterns))
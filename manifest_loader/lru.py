@@ -0,0 +1,63 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    A small thread safe mapping that evicts the least recently used entries
+    once it holds more than ``maxsize`` entries, or when ``maxbytes`` is set,
+    once the sizes given to ``set`` add up to more than ``maxbytes``.
+    """
+    def __init__(self, maxsize=128, maxbytes=None):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.nbytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        """returns the value for key, marking it as recently used"""
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key][0]
+
+    def set(self, key, value, nbytes=0):
+        """stores value under key, evicting old entries when over the limit"""
+        with self._lock:
+            if key in self._data:
+                self.nbytes -= self._data.pop(key)[1]
+            self._data[key] = (value, nbytes)
+            self.nbytes += nbytes
+            while self._data and (
+                    len(self._data) > max(self.maxsize, 0) or
+                    (self.maxbytes is not None and
+                     self.nbytes > self.maxbytes)):
+                self.nbytes -= self._data.popitem(last=False)[1][1]
+
+    def items(self):
+        """returns a list of ``(key, value, nbytes)`` for every entry"""
+        with self._lock:
+            return [(key, value, nbytes)
+                    for key, (value, nbytes) in self._data.items()]
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            value, nbytes = self._data.pop(key)
+            self.nbytes -= nbytes
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
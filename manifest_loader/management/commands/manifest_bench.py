@@ -0,0 +1,147 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.template import Context, Template
+from django.template.loader import get_template
+
+from manifest_loader import instrumentation
+from manifest_loader.utils import APP_SETTINGS, _CACHES, _get_config, \
+    _get_manifest
+
+PHASES = ('load', 'match', 'resolve', 'escape')
+
+
+class Command(BaseCommand):
+    help = ('Renders a template, or a generated sequence of manifest tags, '
+            'repeatedly with cold and warm caches and reports throughput and '
+            'latency percentiles as JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--template', default=None,
+            help='Name of the template to render. Defaults to a generated '
+                 'template using --tags manifest tags.')
+        parser.add_argument(
+            '--tags', type=int, default=20,
+            help='Number of manifest tags in the generated template.')
+        parser.add_argument(
+            '-n', '--iterations', type=int, default=1000,
+            help='Number of renders per run.')
+        parser.add_argument(
+            '--threads', type=int, default=4,
+            help='Number of threads rendering concurrently.')
+        parser.add_argument(
+            '-o', '--output', default=None,
+            help='File to write the JSON results to, defaults to stdout.')
+
+    def handle(self, *args, **options):
+        render = self.get_renderer(options)
+        results = {
+            'template': options['template'] or 'generated',
+            'tags': None if options['template'] else options['tags'],
+            'iterations': options['iterations'],
+            'threads': options['threads'],
+            'cold': run(render, options['iterations'], options['threads'],
+                        cold=True),
+            'warm': run(render, options['iterations'], options['threads'],
+                        cold=False),
+        }
+        output = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                output_file.write(output)
+        else:
+            self.stdout.write(output)
+
+    def get_renderer(self, options):
+        if options['template']:
+            template = get_template(options['template'])
+            return lambda: template.render({})
+        template = Template(generate_template(options['tags']))
+        return lambda: template.render(Context())
+
+
+def generate_template(tags):
+    """returns a template with the given number of manifest tags"""
+    keys = list(_get_manifest())
+    source = ['{% load manifest %}']
+    for index in range(tags):
+        if index % 10 == 9 or not keys:
+            source.append('{% manifest_match "*.js" "{match}" %}')
+        else:
+            source.append('{% manifest "' + keys[index % len(keys)] + '" %}')
+    return '\n'.join(source)
+
+
+def clear_caches():
+    """
+    empties every in-process cache, including the lookup table's and the
+    blocks', and the Django cache entries of every configured manifest
+    """
+    for lru in _CACHES:
+        lru.clear()
+    keys = [_get_config(namespace).get('cache_key', 'webpack_manifest')
+            for namespace in [None, *APP_SETTINGS['manifests']]]
+    cache.delete_many(keys + [key + '_version' for key in keys])
+
+
+def run(render, iterations, threads, cold=False):
+    """
+    renders iterations times on a pool of threads and returns the overall
+    throughput with render and per phase latency percentiles
+    """
+    phases = {phase: [] for phase in PHASES}
+
+    def hook(kind, name, value):
+        if kind == 'timing' and name in phases:
+            phases[name].append(value)
+
+    def timed_render(_):
+        if cold:
+            clear_caches()
+        start = time.perf_counter()
+        render()
+        return time.perf_counter() - start
+
+    if not cold:
+        render()
+    instrumentation.add_hook(hook)
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            latencies = list(pool.map(timed_render, range(iterations)))
+        elapsed = time.perf_counter() - start
+    finally:
+        instrumentation.remove_hook(hook)
+
+    return {
+        'seconds': round(elapsed, 6),
+        'renders_per_second': round(iterations / elapsed, 2)
+        if elapsed else None,
+        'latency_ms': summarize(latencies),
+        'phases_ms': {phase: summarize(values)
+                      for phase, values in phases.items()},
+    }
+
+
+def summarize(values):
+    """returns the count, mean and p50/p95/p99 of values, in milliseconds"""
+    values = sorted(values)
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'mean': round(sum(values) / len(values) * 1000, 4),
+        'p50': round(percentile(values, 50) * 1000, 4),
+        'p95': round(percentile(values, 95) * 1000, 4),
+        'p99': round(percentile(values, 99) * 1000, 4),
+    }
+
+
+def percentile(sorted_values, percent):
+    """nearest rank percentile of a sorted list"""
+    index = max(0, -(-len(sorted_values) * percent // 100) - 1)
+    return sorted_values[int(index)]
@@ -0,0 +1,245 @@
+import gzip
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from manifest_loader.loaders import compile_patterns
+from manifest_loader.utils import APP_SETTINGS, _load_manifest, _is_url
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+METRICS = ('size', 'gzip', 'brotli')
+
+SIZE_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([kmg]?)i?b?\s*$', re.IGNORECASE)
+
+
+class Command(BaseCommand):
+    help = ('Reports the size of the files behind every manifest entry, or '
+            'every entrypoint, checks them against the budgets setting and '
+            'exits with an error when a budget is exceeded.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--namespace', default=None,
+            help='Name of a manifest from the manifests setting, defaults to '
+                 'the default manifest.')
+        parser.add_argument(
+            '--entrypoints', action='store_true',
+            help='Report the files of each entrypoint together, from the '
+                 '"entrypoints" of the manifest, rather than each entry.')
+        parser.add_argument(
+            '--metric', choices=METRICS, default=None,
+            help='Size the budgets apply to. Defaults to the budget_metric '
+                 'setting.')
+        parser.add_argument(
+            '--compressed', action='store_true',
+            help='Also report gzip and, if the brotli package is installed, '
+                 'brotli compressed sizes.')
+        parser.add_argument(
+            '--budget', action='append', default=[],
+            help='A budget as pattern=size, e.g. "*.js=250KB", may be given '
+                 'more than once. Replaces the budgets setting.')
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Number of processes compressing files, 0 to compress in '
+                 'this process. Defaults to the number of CPUs.')
+        parser.add_argument(
+            '-o', '--output', default=None,
+            help='File to write the report to as JSON.')
+
+    def handle(self, *args, **options):
+        metric = options['metric'] or APP_SETTINGS['budget_metric']
+        if metric == 'brotli' and brotli is None:
+            raise CommandError('The brotli package is not installed.')
+        compressed = options['compressed'] or metric != 'size'
+        if options['budget']:
+            budgets = dict(parse_budget(budget)
+                           for budget in options['budget'])
+        else:
+            try:
+                budgets = {pattern: parse_size(size) for pattern, size
+                           in APP_SETTINGS['budgets'].items()}
+            except ValueError as error:
+                raise CommandError(error)
+
+        manifest_obj = _load_manifest(options['namespace'])[0]
+        bundles = collect_bundles(manifest_obj, options['entrypoints'])
+        paths = {name: static_path(name)
+                 for files in bundles.values() for name in files}
+        missing = sorted(name for name, path in paths.items() if not path)
+        if missing:
+            self.stderr.write('Files not found: {}'.format(', '.join(missing)))
+
+        sizes = measure_files(sorted({path for path in paths.values()
+                                      if path}),
+                              compressed, options['workers'])
+        report = build_report(bundles, paths, sizes, budgets, metric)
+
+        self.stdout.write(format_report(report, compressed))
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                json.dump(report, output_file, indent=2)
+        over = [row['name'] for row in report if row['over_budget']]
+        if over:
+            raise CommandError('Over budget: {}'.format(', '.join(over)))
+
+
+def collect_bundles(manifest_obj, entrypoints=False):
+    """
+    returns a dict of bundle names mapped to the list of files in them:
+    each entry of the manifest, or each entrypoint listed under its
+    ``entrypoints`` key, either as lists of files or, as written by
+    webpack-assets-manifest, as lists by file type under ``assets``
+    """
+    if entrypoints:
+        found = manifest_obj.get('entrypoints') \
+            if isinstance(manifest_obj, dict) else None
+        if not isinstance(found, dict):
+            raise CommandError('The manifest has no "entrypoints".')
+        bundles = {}
+        for name, files in found.items():
+            if isinstance(files, dict):
+                files = [file for group in files.get('assets', files).values()
+                         for file in group]
+            bundles[name] = list(dict.fromkeys(files))
+        return bundles
+    return {key: [value] for key, value in manifest_obj.items()
+            if isinstance(value, str)}
+
+
+def static_path(name):
+    """
+    returns the local path of a file named in the manifest, found through
+    the staticfiles finders or the staticfiles storage, or None
+    """
+    if _is_url(name):
+        return None
+    static_url = urlsplit(settings.STATIC_URL or '').path
+    if static_url and name.startswith(static_url):
+        name = name[len(static_url):]
+    name = name.lstrip('/')
+    found = finders.find(name)
+    if found:
+        return found
+    try:
+        if staticfiles_storage.exists(name):
+            return staticfiles_storage.path(name)
+    except NotImplementedError:
+        pass
+    return None
+
+
+def measure_files(paths, compressed=False, workers=None):
+    """
+    returns a dict of paths mapped to their sizes, by metric. Compressed
+    sizes are computed on a pool of ``workers`` processes.
+    """
+    if not compressed:
+        return {path: {'size': os.path.getsize(path)} for path in paths}
+    if workers == 0 or len(paths) < 2:
+        return {path: measure_file(path) for path in paths}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(paths, pool.map(measure_file, paths)))
+
+
+def measure_file(path):
+    """returns the size of the file, gzipped and, if possible, brotli'd"""
+    with open(path, 'rb') as static_file:
+        content = static_file.read()
+    sizes = {'size': len(content),
+             'gzip': len(gzip.compress(content, compresslevel=9))}
+    if brotli is not None:
+        sizes['brotli'] = len(brotli.compress(content))
+    return sizes
+
+
+def build_report(bundles, paths, sizes, budgets, metric='size'):
+    """
+    returns a row per bundle with its total sizes and the smallest budget
+    among the patterns matching its name
+    """
+    report = []
+    for name, files in bundles.items():
+        totals = {}
+        for file in files:
+            for key, size in sizes.get(paths[file], {}).items():
+                totals[key] = totals.get(key, 0) + size
+        matching = [size for pattern, size in budgets.items()
+                    if compile_patterns(pattern)(name)]
+        budget = min(matching) if matching else None
+        report.append({
+            'name': name,
+            'files': files,
+            'sizes': totals,
+            'budget': budget,
+            'over_budget': budget is not None and
+            totals.get(metric, 0) > budget,
+        })
+    return report
+
+
+def format_report(report, compressed=False):
+    """returns the report as a text table"""
+    metrics = [metric for metric in METRICS
+               if compressed or metric == 'size']
+    if brotli is None and 'brotli' in metrics:
+        metrics.remove('brotli')
+    header = ['name', 'files'] + metrics + ['budget', '']
+    rows = [header]
+    for row in report:
+        rows.append([row['name'], str(len(row['files']))] +
+                    [format_size(row['sizes'].get(metric))
+                     for metric in metrics] +
+                    [format_size(row['budget']),
+                     'OVER' if row['over_budget'] else ''])
+    widths = [max(len(row[column]) for row in rows)
+              for column in range(len(header))]
+    return '\n'.join(
+        '  '.join(cell.ljust(width) for cell, width in zip(row, widths))
+        .rstrip() for row in rows)
+
+
+def format_size(size):
+    if size is None:
+        return '-'
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024 or unit == 'MB':
+            return '{:.1f} {}'.format(size, unit) if unit != 'B' \
+                else '{} B'.format(size)
+        size /= 1024
+
+
+def parse_budget(budget):
+    """returns the pattern and size in bytes of a ``pattern=size`` budget"""
+    pattern, sep, size = budget.rpartition('=')
+    try:
+        if not sep or not pattern:
+            raise ValueError
+        return pattern, parse_size(size)
+    except ValueError:
+        raise CommandError('Invalid budget {!r}, expected pattern=size, '
+                           'e.g. "*.js=250KB".'.format(budget))
+
+
+def parse_size(size):
+    """
+    returns a size given as a number of bytes or a string such as ``'250KB'``
+    or ``'1.5 MB'``, in bytes
+    """
+    if isinstance(size, (int, float)):
+        return int(size)
+    match = SIZE_RE.match(str(size))
+    if match is None:
+        raise ValueError('Invalid size {!r}'.format(size))
+    number, unit = match.groups()
+    return int(float(number) * 1024 ** ' kmg'.index(unit.lower() or ' '))
@@ -0,0 +1,33 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from manifest_loader.memory import memory_report
+
+
+class Command(BaseCommand):
+    help = ('Loads the manifests from scratch and reports, as JSON, the '
+            'memory allocated for each manifest, its url table, indexes and '
+            'rendered fragments, next to its size on disk.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--namespace', action='append', default=None,
+            help='Name of a manifest from the manifests setting, may be '
+                 'given more than once. Use "default" for the default '
+                 'manifest. Defaults to every manifest.')
+        parser.add_argument(
+            '-o', '--output', default=None,
+            help='File to write the JSON report to, defaults to stdout.')
+
+    def handle(self, *args, **options):
+        namespaces = options['namespace']
+        if namespaces is not None:
+            namespaces = [None if namespace == 'default' else namespace
+                          for namespace in namespaces]
+        output = json.dumps(memory_report(namespaces), indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                output_file.write(output)
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from manifest_loader.utils import _get_precache
+
+
+class Command(BaseCommand):
+    help = 'Writes the service worker precache list for the manifest as JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--namespace', default=None,
+            help='Name of one of the configured manifests.')
+        parser.add_argument(
+            '--include', action='append', metavar='PATTERN',
+            help='Pattern of keys to include, may be repeated. Defaults to '
+                 'the precache_include setting.')
+        parser.add_argument(
+            '--exclude', action='append', metavar='PATTERN',
+            help='Pattern of keys to exclude, may be repeated. Defaults to '
+                 'the precache_exclude setting.')
+        parser.add_argument(
+            '-o', '--output', default=None,
+            help='File to write to, defaults to stdout.')
+
+    def handle(self, *args, **options):
+        entries, chunks, etag = _get_precache(
+            options['namespace'], options['include'], options['exclude'])
+        if options['output']:
+            with open(options['output'], 'wb') as output:
+                output.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk.decode(), ending='')
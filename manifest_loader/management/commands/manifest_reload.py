@@ -0,0 +1,47 @@
+import os
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from manifest_loader.reload import reload_manifests
+
+
+class Command(BaseCommand):
+    help = ('Reads the manifests again, refreshing copies kept in the Django '
+            'cache, and signals running processes to reload and pre-warm '
+            'them before swapping the new versions in.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pid', type=int, action='append', default=[],
+            help='Process to signal, may be given more than once.')
+        parser.add_argument(
+            '--pidfile', action='append', default=[],
+            help='File holding the id of a process to signal, may be given '
+                 'more than once.')
+        parser.add_argument(
+            '--signal', default='SIGHUP',
+            help='Name of the signal to send, one of the reload_signals '
+                 'setting of the processes. Defaults to SIGHUP.')
+
+    def handle(self, *args, **options):
+        signum = getattr(signal, options['signal'], None)
+        if not isinstance(signum, signal.Signals):
+            raise CommandError('Unknown signal {}'.format(options['signal']))
+        pids = list(options['pid'])
+        for pidfile in options['pidfile']:
+            try:
+                with open(pidfile) as pid_file:
+                    pids.append(int(pid_file.read().strip()))
+            except (OSError, ValueError) as error:
+                raise CommandError('Can\'t read {}: {}'.format(pidfile, error))
+
+        for cache_key, (old, new) in reload_manifests(
+                refresh_cache=True).items():
+            self.stdout.write('{}: {} -> {}'.format(cache_key, old, new))
+        for pid in pids:
+            try:
+                os.kill(pid, signum)
+            except OSError as error:
+                raise CommandError('Can\'t signal {}: {}'.format(pid, error))
+            self.stdout.write('Sent {} to {}'.format(signum.name, pid))
@@ -0,0 +1,95 @@
+import json
+import os
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.template import engines
+
+from manifest_loader.utils import APP_SETTINGS, _build_lookup_table
+
+# {% manifest "key" %}, {% manifest_match "pattern" ... %}, ...
+DJANGO_TAG_RE = re.compile(
+    r'{%\s*(manifest|manifest_match|manifest_inline|manifest_inline_hash)'
+    r'\s+(["\'])(.*?)\2')
+# {{ "key"|manifest }}, {{ "pattern"|manifest_match(...) }}
+JINJA_FILTER_RE = re.compile(
+    r'(["\'])([^"\']*)\1\s*\|\s*(manifest|manifest_match)\b')
+# {{ manifest("key") }}, {{ manifest_match("pattern", ...) }}
+JINJA_CALL_RE = re.compile(
+    r'\b(manifest|manifest_match)\(\s*(["\'])(.*?)\2')
+
+TEMPLATE_EXTENSIONS = ('.html', '.htm', '.txt', '.xml', '.jinja', '.jinja2',
+                       '.j2')
+
+
+class Command(BaseCommand):
+    help = ('Finds the manifest keys and patterns used with literal '
+            'arguments in templates, checks that every key exists and writes '
+            'a lookup table of their urls.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-o', '--output', default=None,
+            help='File to write the lookup table to. Defaults to the '
+                 'lookup_table setting.')
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only check that every key exists, without writing a '
+                 'table.')
+
+    def handle(self, *args, **options):
+        keys, patterns = find_manifest_usages()
+        table, missing = _build_lookup_table(sorted(keys), sorted(patterns))
+        self.stdout.write('Found {} keys and {} patterns in templates.'.format(
+            len(keys), len(patterns)))
+        if missing:
+            raise CommandError('Keys not found in the manifest: {}'.format(
+                ', '.join(missing)))
+        if options['check']:
+            return
+
+        output = options['output'] or APP_SETTINGS['lookup_table']
+        if not output:
+            raise CommandError('Pass --output or set the lookup_table '
+                               'setting.')
+        with open(output, 'w') as output_file:
+            json.dump(table, output_file, indent=2, sort_keys=True)
+        self.stdout.write('Wrote {}.'.format(output))
+
+
+def find_manifest_usages():
+    """
+    returns the sets of keys and patterns passed as literal strings to the
+    manifest tags and filters in the templates of every configured engine
+    """
+    keys, patterns = set(), set()
+    for path in _template_files():
+        with open(path, encoding='utf-8', errors='replace') as template_file:
+            source = template_file.read()
+        for match in DJANGO_TAG_RE.finditer(source):
+            _add_usage(keys, patterns, match.group(1), match.group(3))
+        for match in JINJA_FILTER_RE.finditer(source):
+            _add_usage(keys, patterns, match.group(3), match.group(2))
+        for match in JINJA_CALL_RE.finditer(source):
+            _add_usage(keys, patterns, match.group(1), match.group(3))
+    return keys, patterns
+
+
+def _add_usage(keys, patterns, name, argument):
+    if name == 'manifest_match':
+        patterns.add(argument)
+    else:
+        keys.add(argument)
+
+
+def _template_files():
+    seen = set()
+    for engine in engines.all():
+        for template_dir in engine.template_dirs:
+            for root, dirs, files in os.walk(template_dir):
+                for name in files:
+                    path = os.path.join(root, name)
+                    if name.endswith(TEMPLATE_EXTENSIONS) and \
+                            path not in seen:
+                        seen.add(path)
+                        yield path
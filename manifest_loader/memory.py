@@ -0,0 +1,190 @@
+import gc
+import sys
+import tracemalloc
+from contextlib import contextmanager
+
+from manifest_loader import instrumentation
+from manifest_loader.exceptions import ManifestKeyNotFound
+from manifest_loader.signals import manifest_changed
+from manifest_loader.utils import APP_SETTINGS, ManifestAssets, \
+    _block_cache, _derived_cache, _inline_cache, _loaded, _manifest_cache, \
+    _miss_cache, _CACHES, _load_manifest, _match_urls, _get_variants, \
+    manifest_importmap, manifest_precache
+
+SECTIONS = ('manifest', 'urls', 'indexes', 'fragments', 'misses')
+
+# derived value name -> section of the footprint it is accounted under
+_DERIVED_SECTIONS = {
+    'urls': 'urls',
+    'match': 'urls',
+    'keys': 'indexes',
+    'variants': 'indexes',
+    'importmap': 'fragments',
+    'precache': 'fragments',
+    'srcset': 'fragments',
+    'picture': 'fragments',
+}
+
+
+def deep_sizeof(obj, seen=None):
+    """
+    Returns the size in bytes of obj and everything it refers to through
+    dicts, lists, tuples and sets. Objects whose id is in ``seen`` are
+    skipped, so a shared set avoids counting objects twice.
+    """
+    seen = set() if seen is None else seen
+    size = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+    return size
+
+
+def footprint():
+    """
+    Returns the bytes held by manifest_loader in this process, per section:
+    the parsed manifests, resolved url tables, pattern and variant indexes,
+    rendered fragments and remembered misses, plus ``disk``, the size of the
+    manifest files they were read from. Sizes are measured by walking the
+    caches, see ``deep_sizeof``, which is cheap enough to run periodically.
+    """
+    seen = set()
+    sizes = dict.fromkeys(SECTIONS, 0)
+    manifests = [entry[0] for key, entry, nbytes in _loaded.items()]
+    manifests += [entry[1] for key, entry, nbytes in _manifest_cache.items()]
+    sizes['manifest'] = sum(deep_sizeof(data, seen) for data in manifests)
+    for key, value, nbytes in _derived_cache.items():
+        section = _DERIVED_SECTIONS.get(key[0], 'fragments')
+        sizes[section] += deep_sizeof(value, seen)
+    for lru in (_inline_cache, _block_cache):
+        sizes['fragments'] += sum(deep_sizeof(value, seen)
+                                  for key, value, nbytes in lru.items())
+    sizes['misses'] = sum(deep_sizeof(value, seen)
+                          for key, value, nbytes in _miss_cache.items())
+    sizes['disk'] = _manifest_cache.nbytes
+    return sizes
+
+
+def emit_gauges():
+    """
+    Reports the ``footprint`` to the instrumentation hooks as ``'gauge'``
+    measurements named ``memory.<section>``. Called whenever a manifest is
+    reloaded, and can be called periodically, e.g. from a metrics exporter.
+    Does nothing when no hooks are registered.
+    """
+    if not instrumentation.enabled():
+        return
+    for section, size in footprint().items():
+        instrumentation.emit('gauge', 'memory.' + section, size)
+
+
+def _emit_on_change(**kwargs):
+    emit_gauges()
+
+
+manifest_changed.connect(_emit_on_change)
+
+
+def memory_report(namespaces=None):
+    """
+    Loads the manifests from scratch and measures, with ``tracemalloc``, the
+    memory allocated for the parsed manifest, its resolved url table, the
+    pattern and variant indexes and the rendered fragments, next to the size
+    of the manifest on disk. The caches of this process are emptied while
+    measuring and restored afterwards, and everything is measured twice so
+    one-off allocations, e.g. of compiled regular expressions, are left out.
+
+    :param namespaces: Optional list of manifest names, ``None`` standing
+        for the default manifest. Defaults to every configured manifest.
+    :return: A dict of reports, keyed by manifest name or ``'default'``
+    """
+    if namespaces is None:
+        namespaces = [None, *APP_SETTINGS['manifests']]
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        with _emptied_caches():
+            for attempt in range(2):
+                for lru in _CACHES:
+                    lru.clear()
+                reports = {namespace or 'default': _measure(namespace)
+                           for namespace in namespaces}
+        return reports
+    finally:
+        if started:
+            tracemalloc.stop()
+
+
+@contextmanager
+def _emptied_caches():
+    """
+    puts the entries of every cache back when the block exits, so measuring
+    doesn't reload the manifests of a running process
+    """
+    saved = [(lru, lru.items()) for lru in _CACHES]
+    try:
+        yield
+    finally:
+        for lru, items in saved:
+            lru.clear()
+            for key, value, nbytes in items:
+                lru.set(key, value, nbytes)
+
+
+def _measure(namespace):
+    """returns the memory report for one manifest"""
+    prefix = namespace + ':' if namespace else ''
+    report = {}
+    disk = _manifest_cache.nbytes
+    gc.collect()
+    last = tracemalloc.get_traced_memory()[0]
+
+    def stage(section, build):
+        nonlocal last
+        result = build()
+        gc.collect()
+        current = tracemalloc.get_traced_memory()[0]
+        report[section + '_bytes'] = max(current - last, 0)
+        last = current
+        return result
+
+    manifest_obj = stage('manifest', lambda: _load_manifest(namespace)[0])
+    report['disk_bytes'] = _manifest_cache.nbytes - disk
+    keys = list(manifest_obj) if isinstance(manifest_obj, dict) else []
+
+    def resolve_urls():
+        assets = ManifestAssets()
+        for key in keys:
+            assets.get(prefix + key)
+
+    def build_indexes():
+        _match_urls([prefix + '*'])
+        if keys:
+            try:
+                _get_variants(prefix + keys[0])
+            except ManifestKeyNotFound:
+                pass
+
+    def render_fragments():
+        manifest_importmap(namespace)
+        manifest_precache(namespace)
+
+    stage('urls', resolve_urls)
+    stage('indexes', build_indexes)
+    stage('fragments', render_fragments)
+    report['total_bytes'] = sum(report[section + '_bytes']
+                                for section in SECTIONS
+                                if section + '_bytes' in report)
+    report['ratio'] = round(report['total_bytes'] / report['disk_bytes'], 2) \
+        if report['disk_bytes'] else None
+    return report
@@ -0,0 +1,128 @@
+import asyncio
+
+from django.utils.cache import get_conditional_response, \
+    patch_vary_headers, set_response_etag
+from django.utils.decorators import sync_and_async_middleware
+
+from manifest_loader.utils import manifest_snapshot, _versions_digest, \
+    _get_prefetch_urls
+
+
+@sync_and_async_middleware
+def snapshot_middleware(get_response):
+    """
+    Pins the manifest once per request, so every tag rendered for the
+    response sees the same version and skips the freshness checks.
+    """
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            with manifest_snapshot():
+                return await get_response(request)
+    else:
+        def middleware(request):
+            with manifest_snapshot():
+                return get_response(request)
+    return middleware
+
+
+@sync_and_async_middleware
+def etag_middleware(get_response):
+    """
+    Folds the version of the manifests used while handling the request into
+    the response's ``ETag``, so pages that render manifest assets are
+    invalidated when the manifest changes, and answers matching conditional
+    requests with ``304 Not Modified``. Responses without an ``ETag`` get
+    one computed from their content first, as ``ConditionalGetMiddleware``
+    only sets it on the way out. Responses that didn't use a manifest are
+    left alone. Also pins the manifest like ``snapshot_middleware``, and
+    belongs after ``ConditionalGetMiddleware``.
+    """
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            with manifest_snapshot() as pinned:
+                response = await get_response(request)
+            return _fold_etag(request, response, pinned)
+    else:
+        def middleware(request):
+            with manifest_snapshot() as pinned:
+                response = get_response(request)
+            return _fold_etag(request, response, pinned)
+    return middleware
+
+
+def _fold_etag(request, response, pinned):
+    if not pinned:
+        return response
+    if not response.has_header('ETag') and not response.streaming:
+        set_response_etag(response)
+    if not response.has_header('ETag'):
+        return response
+
+    etag = response['ETag']
+    weak = etag.startswith('W/')
+    tag = etag[2:] if weak else etag
+    tag = '"{}-{}"'.format(tag.strip('"'), _versions_digest(pinned))
+    response['ETag'] = 'W/' + tag if weak else tag
+    # Last-Modified doesn't know about deploys
+    del response['Last-Modified']
+
+    if request.method in ('GET', 'HEAD') and response.status_code == 200:
+        return get_conditional_response(request, etag=response['ETag'],
+                                        response=response)
+    return response
+
+
+@sync_and_async_middleware
+def prefetch_middleware(get_response):
+    """
+    Adds a ``Link: <url>; rel=prefetch`` header for each asset the
+    ``prefetch_routes`` setting lists for the URL name the request resolved
+    to, see ``manifest_loader.utils.manifest_prefetch``.
+    """
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            response = await get_response(request)
+            return _add_prefetch_links(request, response)
+    else:
+        def middleware(request):
+            response = get_response(request)
+            return _add_prefetch_links(request, response)
+    return middleware
+
+
+def _add_prefetch_links(request, response):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return response
+    links = ['<{}>; rel=prefetch'.format(url) for url in
+             _get_prefetch_urls(match.view_name, {'request': request})]
+    if links:
+        if response.has_header('Link'):
+            links.insert(0, response['Link'])
+        response['Link'] = ', '.join(links)
+    return response
+
+
+@sync_and_async_middleware
+def differential_middleware(get_response):
+    """
+    Adds ``User-Agent`` and ``Sec-CH-UA`` to the ``Vary`` header of
+    responses that picked a build with
+    ``manifest_loader.differential.differential_resolver``, so caches keep
+    the modern and legacy pages apart.
+    """
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            response = await get_response(request)
+            return _vary_on_client(request, response)
+    else:
+        def middleware(request):
+            response = get_response(request)
+            return _vary_on_client(request, response)
+    return middleware
+
+
+def _vary_on_client(request, response):
+    if hasattr(request, '_manifest_legacy'):
+        patch_vary_headers(response, ('User-Agent', 'Sec-CH-UA'))
+    return response
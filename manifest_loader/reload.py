@@ -0,0 +1,157 @@
+import contextvars
+import logging
+import signal
+import threading
+
+from django.core.cache import cache
+
+from manifest_loader.utils import APP_SETTINGS, _derived_cache, \
+    _inline_cache, _loaded, _pinned, _pin, _get_config, _refresh_manifest, \
+    _memoize, _resolve_url, _snapshot, _match_urls, _get_inline, \
+    manifest_importmap, manifest_precache, manifest_srcset, manifest_picture
+
+logger = logging.getLogger('manifest_loader')
+
+_reload_lock = threading.Lock()
+
+# derived value name -> function rebuilding it from its arguments, given
+# the namespace prefix of keys and the namespace
+_REBUILDERS = {
+    'match': lambda prefix, namespace, patterns: _match_urls(
+        [prefix + patterns[0], *patterns[1:]]),
+    'importmap': lambda prefix, namespace: manifest_importmap(namespace),
+    'precache': lambda prefix, namespace, include, exclude: (
+        manifest_precache(namespace, include, exclude)),
+    'srcset': lambda prefix, namespace, key, sizes: manifest_srcset(
+        prefix + key, sizes),
+    'picture': lambda prefix, namespace, key, sizes, alt: manifest_picture(
+        prefix + key, sizes, alt),
+}
+
+
+def reload_manifests(refresh_cache=False):
+    """
+    Reads every manifest again and, for each one that changed, builds
+    everything the old version had built before it is used: the resolved
+    url of every key, the results of the patterns matched so far and the
+    rendered fragments. With the ``manual_reload`` setting on, the new
+    version is then swapped in at once, so renders in progress keep the old
+    one and no request finds the caches cold.
+
+    :param refresh_cache: Drop manifests kept in the Django cache, when the
+        ``cache`` setting is on, so they are read from their source again
+    :return: A dict of ``(old version, new version)`` tuples by cache key
+    """
+    with _reload_lock:
+        configs = {}
+        for namespace in [None, *APP_SETTINGS['manifests']]:
+            config = _get_config(namespace)
+            configs[config.get('cache_key', 'webpack_manifest')] = config
+        for cache_key, (config, loaded), nbytes in _pinned.items():
+            configs.setdefault(cache_key, config)
+        return {cache_key: _reload(cache_key, config, refresh_cache)
+                for cache_key, config in configs.items()}
+
+
+def _reload(cache_key, config, refresh_cache):
+    """reloads, pre-warms and swaps in one manifest"""
+    pinned = _pinned.get(cache_key)
+    old = pinned[1] if pinned else _loaded.get(cache_key)
+    old = old[:2] if old else None
+    if refresh_cache and config['cache']:
+        cache.delete_many([cache_key, cache_key + '_version'])
+    new = _refresh_manifest(config, cache_key)
+    if old is None or old[1] != new[1]:
+        _prewarm(cache_key, config, new, old[1] if old else None)
+    if config['manual_reload']:
+        _pin(cache_key, (config, new))
+    return old[1] if old else None, new[1]
+
+
+def _prewarm(cache_key, config, new, old_version):
+    """
+    builds the url table of the new version, then renders again what was
+    rendered for the old one, with the new version pinned. Fragments are
+    only rebuilt for the default and named manifests, not for settings a
+    ``resolver`` picked per request.
+    """
+    data, version = new
+    loader = config['loader']
+    urls = _memoize('urls', config, version, dict)
+    if isinstance(data, dict):
+        for key in data:
+            if key not in urls:
+                value = loader.get_single_match(data, key)
+                if not loader.is_missing(data, key, value):
+                    urls[key] = _resolve_url(value)
+
+    namespace = _find_namespace(cache_key)
+    if old_version is None or namespace is False:
+        return
+    prefix = namespace + ':' if namespace else ''
+    hot = [(name, args) for (name, entry_cache_key, entry_version, *args),
+           value, nbytes in _derived_cache.items()
+           if entry_cache_key == cache_key and entry_version == old_version
+           and name in _REBUILDERS]
+    inline = [key for (entry_cache_key, entry_version, key), value, nbytes
+              in _inline_cache.items()
+              if entry_cache_key == cache_key and entry_version == old_version]
+
+    def rebuild():
+        # renders in progress keep their own snapshot, this one pins the new
+        # version for the rebuilds
+        _snapshot.set({cache_key: new})
+        for name, args in hot:
+            _rebuild(_REBUILDERS[name], prefix, namespace, *args)
+        for key in inline:
+            _rebuild(_rebuild_inline, prefix, namespace, key)
+
+    contextvars.Context().run(rebuild)
+
+
+def _rebuild(rebuilder, prefix, namespace, *args):
+    try:
+        rebuilder(prefix, namespace, *args)
+    except Exception:
+        logger.warning('Pre-warming %r for manifest %s failed', args,
+                       namespace or 'default', exc_info=True)
+
+
+def _rebuild_inline(prefix, namespace, key):
+    _get_inline(prefix + key)
+
+
+def _find_namespace(cache_key):
+    """
+    returns the namespace whose settings use the cache key, None for the
+    default manifest, or False if the key belongs to a resolver's settings
+    """
+    for namespace in [None, *APP_SETTINGS['manifests']]:
+        if _get_config(namespace).get('cache_key',
+                                      'webpack_manifest') == cache_key:
+            return namespace
+    return False
+
+
+def install_signal_handlers(signals=None):
+    """
+    Reloads the manifests, see ``reload_manifests``, on a background thread
+    whenever the process receives one of the signals, given by name, e.g.
+    ``['SIGHUP', 'SIGUSR2']``. Defaults to the ``reload_signals`` setting.
+    Must be called from the main thread.
+    """
+    for name in APP_SETTINGS['reload_signals'] if signals is None \
+            else signals:
+        signal.signal(getattr(signal, name), _handle_signal)
+
+
+def _handle_signal(signum, frame):
+    threading.Thread(target=_reload_in_background, daemon=True,
+                     name='manifest-loader-reload').start()
+
+
+def _reload_in_background():
+    try:
+        reload_manifests()
+    except Exception:
+        logger.exception('Reloading the manifests failed')
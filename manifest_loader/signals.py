@@ -0,0 +1,8 @@
+from django.dispatch import Signal
+
+# Sent when a manifest is loaded with a different version than the one
+# loaded before it, with the keyword arguments ``cache_key``,
+# ``old_version``, ``new_version`` and the sets of keys ``added``,
+# ``removed`` and ``changed``, which are None when the manifests aren't
+# dicts and can't be compared.
+manifest_changed = Signal()
@@ -0,0 +1,161 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+
+from django.core.files.storage import Storage
+from django.utils.module_loading import import_string
+
+from manifest_loader.exceptions import WebpackManifestNotFound
+
+logger = logging.getLogger('manifest_loader')
+
+_syncs = {}
+_syncs_lock = threading.Lock()
+
+
+def get_local_copy(storage, name, cache_dir=None, interval=60):
+    """
+    Returns the path of a local copy of the file ``name`` in ``storage``.
+    The copy is downloaded on first use when there is none. A copy left by a
+    previous process is served as is while a background thread checks it
+    against the storage, and from then on the copy is refreshed every
+    ``interval`` seconds, so callers only ever wait on the storage when no
+    local copy exists yet. See also ``sync_local_copies``.
+    """
+    cache_dir = cache_dir or os.path.join(tempfile.gettempdir(),
+                                          'manifest_loader')
+    key = (storage if isinstance(storage, str) else id(storage), name,
+           cache_dir)
+    with _syncs_lock:
+        sync = _syncs.get(key)
+        if sync is None:
+            sync = _syncs[key] = StorageSync(_get_storage(storage), name,
+                                             cache_dir, interval)
+    return sync.get_path()
+
+
+def sync_local_copies(configs):
+    """
+    Gets the local copy of the manifest of every config using a storage, so
+    copies are downloaded, or checked on a background thread, when the
+    process starts rather than on the first render. Errors are logged.
+    """
+    for config in configs:
+        if not config['storage']:
+            continue
+        try:
+            get_local_copy(config['storage'], config['manifest_file'],
+                           config['storage_cache_dir'],
+                           config['storage_refresh_interval'])
+        except Exception:
+            logger.exception('Syncing the manifest %r from storage failed',
+                             config['manifest_file'])
+
+
+def _get_storage(storage):
+    """
+    accepts a Storage instance, or the dotted path to a Storage class or
+    instance
+    """
+    if isinstance(storage, str):
+        storage = import_string(storage)
+    if isinstance(storage, type):
+        storage = storage()
+    if not isinstance(storage, Storage):
+        raise TypeError('MANIFEST_LOADER["storage"] must be a Django '
+                        'Storage or the dotted path to one')
+    return storage
+
+
+class StorageSync:
+    """
+    Keeps a local copy of a file held in a Django storage up to date. A
+    refresh only downloads the file when its modification time changed, or
+    when the storage can't tell, and only replaces the local copy when the
+    contents changed.
+    """
+    def __init__(self, storage, name, cache_dir, interval=60):
+        self.storage = storage
+        self.name = name
+        self.interval = interval
+        # storages are deconstructible, which identifies their location
+        identity = storage.deconstruct() if hasattr(storage, 'deconstruct') \
+            else type(storage).__qualname__
+        digest = hashlib.blake2b('{!r}:{}'.format(identity, name).encode(),
+                                 digest_size=8).hexdigest()
+        self.path = os.path.join(
+            cache_dir, '{}-{}'.format(digest, os.path.basename(name)))
+        self.modified_time = None
+        self.etag = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def get_path(self):
+        """
+        returns the local path, downloading the file if there is no copy.
+        An existing copy is checked against the storage on the background
+        thread.
+        """
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    leftover = os.path.exists(self.path)
+                    if not leftover:
+                        self.refresh()
+                    self._thread = threading.Thread(
+                        target=self._run, args=(leftover,), daemon=True,
+                        name='manifest-loader-sync')
+                    self._thread.start()
+        return self.path
+
+    def refresh(self):
+        """
+        downloads the file if it changed. Returns True if the local copy was
+        replaced.
+        """
+        try:
+            modified_time = self.storage.get_modified_time(self.name)
+        except (NotImplementedError, OSError):
+            modified_time = None
+        if modified_time is not None and \
+                modified_time == self.modified_time and \
+                os.path.exists(self.path):
+            return False
+
+        try:
+            with self.storage.open(self.name, 'rb') as remote_file:
+                raw = remote_file.read()
+        except (OSError, ValueError):
+            raise WebpackManifestNotFound(self.name)
+        self.modified_time = modified_time
+
+        etag = hashlib.blake2b(raw, digest_size=8).hexdigest()
+        if etag == self.etag and os.path.exists(self.path):
+            return False
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path))
+        with os.fdopen(fd, 'wb') as tmp_file:
+            tmp_file.write(raw)
+        os.replace(tmp_path, self.path)
+        self.etag = etag
+        return True
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self, check_first=False):
+        if check_first:
+            self._refresh_logged()
+        while self.interval and not self._stopped.wait(self.interval):
+            self._refresh_logged()
+
+    def _refresh_logged(self):
+        try:
+            self.refresh()
+        except Exception:
+            logger.exception('Refreshing the manifest %r from storage '
+                             'failed', self.name)
@@ -1,5 +1,12 @@
 from django import template
-from manifest_loader.utils import _get_value, manifest, manifest_match
+from manifest_loader.exceptions import ManifestKeyNotFound
+from manifest_loader.utils import _get_value, manifest, manifest_match, \
+    _is_quoted_string, _check_key, APP_SETTINGS, manifest_importmap, \
+    manifest_importmap_hash, manifest_inline, manifest_inline_hash, \
+    manifest_srcset, manifest_picture, manifest_prefetch, \
+    _recording_snapshot, _block_key, _get_block, _set_block, _make_version, \
+    _get_block_namespaces, _set_block_namespaces, manifest_preconnect
+from django.utils.safestring import mark_safe
 
 register = template.Library()
 
@@ -16,23 +23,86 @@ def do_manifest_match(parser, token):
     return ManifestMatchNode(token)
 
 
+@register.tag('manifest_inline')
+def do_manifest_inline(parser, token):
+    """Returns the manifest inline tag"""
+    return ManifestNode(token, manifest_inline)
+
+
+@register.tag('manifest_inline_hash')
+def do_manifest_inline_hash(parser, token):
+    """Returns the manifest inline hash tag"""
+    return ManifestNode(token, manifest_inline_hash)
+
+
+@register.tag('manifest_importmap')
+def do_manifest_importmap(parser, token):
+    """Returns the manifest importmap tag"""
+    return ManifestImportmapNode(token, manifest_importmap)
+
+
+@register.tag('manifest_importmap_hash')
+def do_manifest_importmap_hash(parser, token):
+    """Returns the manifest importmap hash tag"""
+    return ManifestImportmapNode(token, manifest_importmap_hash)
+
+
+@register.tag('manifest_preconnect')
+def do_manifest_preconnect(parser, token):
+    """Returns the manifest preconnect tag"""
+    return ManifestImportmapNode(token, manifest_preconnect)
+
+
+@register.tag('manifest_srcset')
+def do_manifest_srcset(parser, token):
+    """Returns the manifest srcset tag"""
+    return ManifestSrcsetNode(token, manifest_srcset, 2)
+
+
+@register.tag('manifest_picture')
+def do_manifest_picture(parser, token):
+    """Returns the manifest picture tag"""
+    return ManifestSrcsetNode(token, manifest_picture, 3)
+
+
+@register.tag('manifest_prefetch')
+def do_manifest_prefetch(parser, token):
+    """Returns the manifest prefetch tag"""
+    return ManifestPrefetchNode(token)
+
+
+@register.tag('manifest_block')
+def do_manifest_block(parser, token):
+    """Returns the manifest block tag"""
+    nodelist = parser.parse(('endmanifest_block',))
+    parser.delete_first_token()
+    return ManifestBlockNode(nodelist, [
+        parser.compile_filter(bit) for bit in token.split_contents()[1:]])
+
+
 class ManifestNode(template.Node):
     """
     Template node for the manifest tag
     """
-    def __init__(self, token):
+    def __init__(self, token, func=manifest):
         bits = token.split_contents()
         if len(bits) < 2:
             raise template.TemplateSyntaxError(
                 "'%s' takes one argument (name of file)" % bits[0])
         self.bits = bits
+        self.func = func
+        if APP_SETTINGS['strict'] and _is_quoted_string(bits[1]):
+            try:
+                _check_key(bits[1][1:-1])
+            except ManifestKeyNotFound as error:
+                raise template.TemplateSyntaxError(str(error))
 
     def render(self, context):
         """
         returns the url of the found asset
         """
         manifest_key = _get_value(self.bits[1], context)
-        return manifest(manifest_key, context)
+        return self.func(manifest_key, context)
 
 
 class ManifestMatchNode(template.Node):
@@ -52,7 +122,111 @@ class ManifestMatchNode(template.Node):
         returns a string of all found urls,
             each embedded in the provided string
         """
-        search_string = _get_value(self.bits[1], context)
-        output_tag = _get_value(self.bits[2], context)
-        return manifest_match(search_string, output_tag, context)
+        patterns = [_get_value(bit, context) for bit in self.bits[1:-1]]
+        output_tag = _get_value(self.bits[-1], context)
+        return manifest_match(patterns, output_tag, context)
+
+
+class ManifestImportmapNode(template.Node):
+    """
+    Template node for the manifest importmap, importmap hash and preconnect
+    tags
+    """
+    def __init__(self, token, func):
+        self.bits = token.split_contents()
+        if len(self.bits) > 2:
+            raise template.TemplateSyntaxError(
+                "'%s' takes at most one argument (name of the manifest)"
+                % self.bits[0]
+            )
+        self.func = func
+
+    def render(self, context):
+        """
+        returns the import map script tag, its CSP hash or the preconnect
+        link tags
+        """
+        namespace = None
+        if len(self.bits) == 2:
+            namespace = _get_value(self.bits[1], context) or None
+        return self.func(namespace, context)
 
+
+class ManifestSrcsetNode(template.Node):
+    """
+    Template node for the manifest srcset and picture tags
+    """
+    def __init__(self, token, func, max_args):
+        self.bits = token.split_contents()
+        if not 2 <= len(self.bits) <= max_args + 1:
+            raise template.TemplateSyntaxError(
+                "'%s' takes one to %d arguments (name of file, sizes%s)"
+                % (self.bits[0], max_args,
+                   ', alt text' if max_args > 2 else ''))
+        self.func = func
+
+    def render(self, context):
+        """
+        returns the srcset attributes or the picture element
+        """
+        args = [_get_value(bit, context) for bit in self.bits[1:]]
+        return self.func(*args, context=context)
+
+
+class ManifestPrefetchNode(template.Node):
+    """
+    Template node for the manifest prefetch tag
+    """
+    def __init__(self, token):
+        self.bits = token.split_contents()
+        if len(self.bits) > 2:
+            raise template.TemplateSyntaxError(
+                "'%s' takes at most one argument (URL name of the route)"
+                % self.bits[0]
+            )
+
+    def render(self, context):
+        """
+        returns the prefetch link tags for the route
+        """
+        route = None
+        if len(self.bits) == 2:
+            route = _get_value(self.bits[1], context) or None
+        return manifest_prefetch(route, context)
+
+
+class ManifestBlockNode(template.Node):
+    """
+    Template node for the manifest block tag
+    """
+    def __init__(self, nodelist, vary_on):
+        self.nodelist = nodelist
+        self.vary_on = vary_on
+        # identifies the block by its contents, stable across processes
+        self.source_key = _make_version('\0'.join(
+            node.token.contents
+            for node in nodelist.get_nodes_by_type(template.Node)
+            if getattr(node, 'token', None) is not None).encode())
+
+    def render(self, context):
+        """
+        returns the rendered block, rendering it only once per manifest
+        version, autoescaping and vary on values
+        """
+        vary_on = [repr(var.resolve(context)) for var in self.vary_on]
+        node_key = (self.origin.name if self.origin else None,
+                    self.source_key)
+        namespaces = _get_block_namespaces(node_key)
+        if namespaces is not None:
+            key = _block_key(node_key, namespaces, context, vary_on)
+            html = _get_block(key)
+            if html is not None:
+                return mark_safe(html)
+            html = self.nodelist.render(context)
+        else:
+            with _recording_snapshot(context) as namespaces:
+                html = self.nodelist.render(context)
+            _set_block_namespaces(node_key, namespaces)
+            key = _block_key(node_key, namespaces, context, vary_on)
+        _set_block(key, str(html))
+        return html
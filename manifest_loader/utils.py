@@ -1,28 +1,134 @@
+import asyncio
+import base64
+import contextvars
+import fnmatch
+import functools
+import hashlib
 import json
+import logging
+import mimetypes
 import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit, urlunsplit
 
 from django.templatetags.static import StaticNode
 from django.conf import settings
-from django.core.cache import cache
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache, caches
+from django.core.signals import setting_changed
+from django.template.context import BaseContext
 from django.utils.html import conditional_escape
+from django.utils.safestring import mark_safe
 from django.core.validators import URLValidator
 from django.core.exceptions import ValidationError
 
 from manifest_loader.exceptions import WebpackManifestNotFound, \
-    CustomManifestLoaderNotValid
-from manifest_loader.loaders import DefaultLoader, LoaderABC
+    CustomManifestLoaderNotValid, ManifestKeyNotFound
+from manifest_loader.loaders import DefaultLoader, LoaderABC, \
+    compile_patterns
+from manifest_loader import instrumentation
+from manifest_loader.devserver import get_dev_server_manifest
+from manifest_loader.lru import LRUCache
+from manifest_loader.signals import manifest_changed
+from manifest_loader.storage import get_local_copy
 
 
 APP_SETTINGS = {
     'output_dir': None,
     'manifest_file': 'manifest.json',
     'cache': False,
-    'loader': DefaultLoader
+    'loader': DefaultLoader,
+    'strict': False,
+    'miss_cache_size': 256,
+    'miss_warning_interval': 60,
+    'manifests': {},
+    'resolver': None,
+    'manifest_cache_size': 32,
+    'manifest_cache_bytes': None,
+    'derived_cache_size': 256,
+    'importmap_patterns': ['*.js', '*.mjs'],
+    'json_patterns': None,
+    'precache_include': ['*'],
+    'precache_exclude': ['*.map'],
+    'inline_max_size': 16 * 1024,
+    'inline_cache_bytes': 1024 * 1024,
+    'storage': None,
+    'storage_cache_dir': None,
+    'storage_refresh_interval': 60,
+    'dev_server_url': None,
+    'dev_server_refresh_interval': 1.0,
+    'lookup_table': None,
+    'srcset_pattern': r'^(?P<name>.+?)(?:@(?P<density>\d+(?:\.\d+)?)x|'
+                      r'-(?P<width>\d+)w)?\.(?P<ext>\w+)$',
+    'srcset_formats': ['avif', 'webp'],
+    'manual_reload': False,
+    'reload_signals': [],
+    'prefetch_routes': {},
+    'block_cache': None,
+    'block_cache_bytes': 1024 * 1024,
+    'legacy_overrides': None,
+    'ua_cache_size': 1024,
+    'url_prefixes': [],
+    'budgets': {},
+    'budget_metric': 'size',
 }
 
 if hasattr(settings, 'MANIFEST_LOADER'):
     APP_SETTINGS.update(settings.MANIFEST_LOADER)
 
+logger = logging.getLogger('manifest_loader')
+
+# (manifest version, key) -> [resolved url or error, last warning time]
+_miss_cache = LRUCache(APP_SETTINGS['miss_cache_size'])
+
+# cache key -> (manifest, version) pinned for the current request
+_snapshot = contextvars.ContextVar('manifest_loader_snapshot', default=None)
+
+# manifest path -> (file stamp, manifest, version), sized by the file size
+_manifest_cache = LRUCache(APP_SETTINGS['manifest_cache_size'],
+                           APP_SETTINGS['manifest_cache_bytes'])
+
+# (name, cache key, manifest version, *args) -> value derived from a manifest
+_derived_cache = LRUCache(APP_SETTINGS['derived_cache_size'])
+
+# (cache key, manifest version, key) -> (html, CSP hash), sized by the html
+_inline_cache = LRUCache(APP_SETTINGS['derived_cache_size'],
+                         APP_SETTINGS['inline_cache_bytes'])
+
+# (template, position, manifest versions, autoescape, vary on) -> html,
+# sized by the html
+_block_cache = LRUCache(APP_SETTINGS['derived_cache_size'],
+                        APP_SETTINGS['block_cache_bytes'])
+
+# (template, block contents) -> namespaces of the manifests the block uses,
+# found on its first render
+_block_namespaces = LRUCache(APP_SETTINGS['derived_cache_size'])
+
+# (event loop, cache key) -> future of a manifest load in progress
+_loading = {}
+
+# cache key -> (manifest, version, loader) last loaded, with the manifest as
+# reshaped by the loader, used to diff reloads, sized by the manifest. A
+# manifest evicted from it isn't diffed on its next reload
+_loaded = LRUCache(APP_SETTINGS['manifest_cache_size'],
+                   APP_SETTINGS['manifest_cache_bytes'])
+_loaded_lock = threading.Lock()
+
+# cache key -> (config, (manifest, version)) served until the next reload,
+# when the manual_reload setting is on, sized by the manifest. A manifest
+# evicted from it is read again the next time it's used
+_pinned = LRUCache(APP_SETTINGS['manifest_cache_size'],
+                   APP_SETTINGS['manifest_cache_bytes'])
+_pinned_lock = threading.Lock()
+
+# every in-process cache, for tools emptying them
+_CACHES = (_manifest_cache, _derived_cache, _inline_cache, _block_cache,
+           _block_namespaces, _miss_cache, _loaded, _pinned)
+
 
 def manifest(key, context=None):
     """
@@ -32,9 +138,38 @@ def manifest(key, context=None):
     :param context: optional, Django template context
     :return: string that points to the url of the requested resource
     """
-    manifest_obj = _get_manifest()
-    manifest_value = _load_from_manifest(manifest_obj, key=key)
-    return _make_url(manifest_value, context)
+    timer = instrumentation.timer()
+    table = _get_lookup_table(context)
+    if table is not None:
+        url = table['keys'].get(key)
+        if url is not None:
+            timer.lap('load')
+            url = _escape_url(url, context)
+            timer.lap('escape')
+            return url
+
+    namespace, key = _split_namespace(key)
+    config = _get_config(namespace, context)
+    manifest_obj, version = _load_manifest(context=context, config=config)
+    timer.lap('load')
+    if not issubclass(config['loader'], LoaderABC):
+        raise CustomManifestLoaderNotValid
+    urls = _memoize('urls', config, version, dict)
+    url = urls.get(key)
+    timer.lap('match')
+    if url is None:
+        manifest_value = _load_from_manifest(manifest_obj, key=key,
+                                             config=config)
+        if config['loader'].is_missing(manifest_obj, key, manifest_value):
+            if config['strict']:
+                raise ManifestKeyNotFound(key)
+            url = _resolve_missing(manifest_value, version)
+        else:
+            url = urls[key] = _resolve_url(manifest_value)
+    timer.lap('resolve')
+    url = _escape_url(url, context)
+    timer.lap('escape')
+    return url
 
 
 def manifest_match(pattern, output, context=None):
@@ -42,55 +177,1233 @@ def manifest_match(pattern, output, context=None):
     Looks up the provided pattern against the manifest and injects all
     matching values into the output string.
 
-    :param pattern: A pattern used to match against the keys in the manifest
+    :param pattern: A pattern used to match against the keys in the manifest, or a list of patterns. Patterns starting with ``!`` exclude keys and patterns starting with ``re:`` are regular expressions.
     :param output: A string containing the substring ``{match}``. The output is repeated for each match found in the manifest and the substring is replaced by the urls derived from the manifest.
     :param context: Optional Django template context
     :return: Returns a string of urls embedded into the output
     """
-    manifest_obj = _get_manifest()
-    files = _load_from_manifest(manifest_obj, pattern=pattern)
-    urls = [_make_url(file, context) for file in files]
-    output_tags = [output.format(match=file) for file in urls]
+    timer = instrumentation.timer()
+    patterns = [pattern] if isinstance(pattern, str) else list(pattern)
+    table = _get_lookup_table(context)
+    if table is not None and len(patterns) == 1 and \
+            patterns[0] in table['patterns']:
+        urls = table['patterns'][patterns[0]]
+        timer.lap('load')
+    else:
+        urls = _match_urls(patterns, context, timer)
+    output_tags = [output.format(match=_escape_url(url, context))
+                   for url in urls]
+    timer.lap('escape')
     return '\n'.join(output_tags)
 
 
-def _get_manifest():
+def _match_urls(patterns, context=None, timer=None):
+    """
+    returns the unescaped urls of the manifest entries matching the
+    patterns, computed once per manifest version. The namespace of the first
+    pattern applies to all of them.
+    """
+    timer = timer or instrumentation.timer()
+    namespace, first = _split_namespace(patterns[0])
+    patterns = [first] + patterns[1:]
+    config = _get_config(namespace, context)
+    manifest_obj, version = _load_manifest(context=context, config=config)
+    timer.lap('load')
+
+    def build():
+        files = _load_from_manifest(
+            manifest_obj, pattern=patterns[0] if len(patterns) == 1
+            else patterns, config=config)
+        timer.lap('match')
+        return [_resolve_url(file) for file in files]
+
+    urls = _memoize('match', config, version, build, tuple(patterns))
+    timer.lap('resolve')
+    return urls
+
+
+async def manifest_async(key, context=None):
+    """
+    Works like ``manifest``, for async Jinja environments, which await it
+    when it's used as a filter or global. The manifest, and the lookup table
+    if one is used, are read on a worker thread rather than the event
+    loop's, see ``_load_manifest_async``.
+
+    :param key: string indicating the key to pull from the manifest file
+    :param context: optional, Django template context
+    :return: string that points to the url of the requested resource
+    """
+    namespace = _split_namespace(key)[0]
+    loaded = await _load_manifest_async(namespace, context)
+    with _pinned_for(loaded, context):
+        return manifest(key, context)
+
+
+async def manifest_match_async(pattern, output, context=None):
+    """
+    Works like ``manifest_match``, for async Jinja environments, see
+    ``manifest_async``.
+
+    :param pattern: A pattern, or list of patterns, see ``manifest_match``
+    :param output: A string containing the substring ``{match}``
+    :param context: Optional Django template context
+    :return: Returns a string of urls embedded into the output
+    """
+    first = pattern if isinstance(pattern, str) else list(pattern)[0]
+    loaded = await _load_manifest_async(_split_namespace(first)[0], context)
+    with _pinned_for(loaded, context):
+        return manifest_match(pattern, output, context)
+
+
+async def _load_manifest_async(namespace=None, context=None):
+    """
+    returns a dict of the ``(manifest, version)`` tuples a lookup in the
+    manifest reads: the manifest's, by cache key, and the lookup table's, if
+    one is used, under ``_TABLE_KEY``. Those in the snapshot, or pinned until
+    the next reload, are reused, the others are read on a worker thread, and
+    concurrent loads of the same manifest on one event loop share a read. A
+    waiter being cancelled doesn't cancel the read for the others.
+    """
+    config = _get_config(namespace, context)
+    cache_key = config.get('cache_key', 'webpack_manifest')
+    snapshot = _get_snapshot(context) or {}
+    loaded = {key: snapshot[key] for key in (cache_key, _TABLE_KEY)
+              if key in snapshot}
+    pinned = _pinned.get(cache_key) if config['manual_reload'] else None
+    if pinned is not None:
+        loaded.setdefault(cache_key, pinned[1])
+    if cache_key in loaded and (_TABLE_KEY in loaded or
+                                _lookup_table_path() is None):
+        return loaded
+
+    loop = asyncio.get_running_loop()
+    future = _loading.get((loop, cache_key))
+    if future is None:
+        future = loop.run_in_executor(None, _fetch_for_lookup, config,
+                                      cache_key)
+        _loading[(loop, cache_key)] = future
+        future.add_done_callback(
+            lambda done: _loading.pop((loop, cache_key), None))
+    return {**await asyncio.shield(future), **loaded}
+
+
+def _fetch_for_lookup(config, cache_key):
+    """reads what ``_load_manifest_async`` returns, blocking"""
+    fetched = {cache_key: _fetch_manifest(config, cache_key)}
+    path = _lookup_table_path()
+    if path is not None:
+        fetched[_TABLE_KEY] = _read_manifest(path)
+    return fetched
+
+
+@contextmanager
+def _pinned_for(loaded, context=None):
+    """
+    pins the loaded manifests in the current snapshot, or in a snapshot
+    lasting for the block when there is none
+    """
+    snapshot = _get_snapshot(context)
+    if snapshot is not None:
+        for key, value in loaded.items():
+            snapshot.setdefault(key, value)
+        yield
+        return
+    token = _snapshot.set(dict(loaded))
+    try:
+        yield
+    finally:
+        _snapshot.reset(token)
+
+
+class ManifestAssets:
+    """
+    A lazy, read only mapping of manifest keys to urls, as returned by the
+    ``manifest_loader.context_processors.assets`` context processor. Nothing
+    is loaded until the first lookup, the manifest is then pinned for the
+    lifetime of the object, and every url is memoized.
+
+    Keys can be looked up by item, ``assets['main.js']``, or, in templates,
+    by attribute with the dot before the extension written as an underscore,
+    ``assets.main_js``. Keys missing from the manifest raise ``KeyError``
+    and ``AttributeError`` respectively.
+    """
+    def __init__(self, request=None):
+        self._context = {'request': request}
+        self._manifests = {}
+        self._urls = {}
+
+    def __getitem__(self, key):
+        try:
+            return self._urls[key]
+        except KeyError:
+            pass
+        url = self._urls[key] = self._lookup(key)
+        return url
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        head, sep, tail = name.rpartition('_')
+        for key in ((head + '.' + tail) if sep else name, name):
+            try:
+                return self[key]
+            except KeyError:
+                continue
+        raise AttributeError(name)
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def _lookup(self, full_key):
+        table = _get_lookup_table()
+        if table is not None and full_key in table['keys']:
+            return table['keys'][full_key]
+
+        namespace, key = _split_namespace(full_key)
+        if namespace not in self._manifests:
+            config = _get_config(namespace, self._context)
+            manifest_obj, version = _load_manifest(config=config)
+            urls = _memoize('urls', config, version, dict)
+            self._manifests[namespace] = (config, manifest_obj, urls)
+        config, manifest_obj, urls = self._manifests[namespace]
+
+        url = urls.get(key)
+        if url is None:
+            value = _load_from_manifest(manifest_obj, key=key, config=config)
+            if config['loader'].is_missing(manifest_obj, key, value):
+                raise KeyError(full_key)
+            url = urls[key] = _resolve_url(value)
+        return url
+
+
+def _get_lookup_table(context=None):
+    """
+    returns the pre-resolved lookup table written by the ``manifest_scan``
+    command, or None if the ``lookup_table`` setting isn't used. The table
+    is skipped when a resolver picks manifests per request, and pinned in
+    the snapshot like the manifests.
+    """
+    loaded = _load_lookup_table(context)
+    return None if loaded is None else loaded[0]
+
+
+def _load_lookup_table(context=None):
+    """
+    returns the ``(table, version)`` tuple of the lookup table, pinned in
+    the snapshot, or None if none is used
+    """
+    path = _lookup_table_path()
+    if path is None:
+        return None
+    snapshot = _get_snapshot(context)
+    if snapshot is None:
+        return _read_manifest(path)
+    pinned = snapshot.get(_TABLE_KEY)
+    if pinned is None:
+        pinned = snapshot[_TABLE_KEY] = _read_manifest(path)
+    return pinned
+
+
+# key of the lookup table in snapshots, which can't be a manifest cache key
+_TABLE_KEY = ':lookup_table'
+
+
+def _lookup_table_path():
+    """returns the path of the lookup table, if one is used"""
+    if not APP_SETTINGS['lookup_table'] or APP_SETTINGS['resolver']:
+        return None
+    return APP_SETTINGS['lookup_table']
+
+
+def _build_lookup_table(keys=(), patterns=()):
+    """
+    resolves the given keys and patterns, which may carry a namespace
+    prefix, against their manifests. Returns the lookup table used by
+    ``_get_lookup_table`` and the list of keys missing from the manifests.
+    """
+    table = {'keys': {}, 'patterns': {}}
+    missing = []
+    for full_key in keys:
+        namespace, key = _split_namespace(full_key)
+        config = _get_config(namespace)
+        manifest_obj = _load_manifest(config=config)[0]
+        value = _load_from_manifest(manifest_obj, key=key, config=config)
+        if config['loader'].is_missing(manifest_obj, key, value):
+            missing.append(full_key)
+        else:
+            table['keys'][full_key] = _resolve_url(value)
+    for full_pattern in patterns:
+        namespace, pattern = _split_namespace(full_pattern)
+        config = _get_config(namespace)
+        manifest_obj = _load_manifest(config=config)[0]
+        files = _load_from_manifest(manifest_obj, pattern=pattern,
+                                    config=config)
+        table['patterns'][full_pattern] = [_resolve_url(file)
+                                           for file in files]
+    return table, missing
+
+
+def manifest_inline(key, context=None):
+    """
+    Returns the contents of the asset inlined into a ``<style>`` tag for css
+    or a ``<script>`` tag for javascript. Other assets, assets larger than
+    the ``inline_max_size`` setting and assets whose contents would end the
+    tag early are linked to instead. The file is read once per manifest
+    version.
+
+    :param key: string indicating the key to pull from the manifest file
+    :param context: optional, Django template context
+    :return: A string containing the html tag
+    """
+    return mark_safe(_get_inline(key, context)[0])
+
+
+def manifest_inline_hash(key, context=None):
+    """
+    Returns the CSP source expression, e.g. ``'sha256-...'``, matching the
+    tag returned by ``manifest_inline``, or an empty string if the asset is
+    linked to rather than inlined.
+
+    :param key: string indicating the key to pull from the manifest file
+    :param context: optional, Django template context
+    :return: A string to add to the ``style-src`` or ``script-src`` directive
+    """
+    return _get_inline(key, context)[1]
+
+
+def _get_inline(key, context=None):
+    """
+    returns the inline html for the asset and its CSP hash, kept in a byte
+    size bounded LRU
+    """
+    namespace, key = _split_namespace(key)
+    config = _get_config(namespace, context)
+    manifest_obj, version = _load_manifest(context=context, config=config)
+    cache_key = (config.get('cache_key', 'webpack_manifest'), version, key)
+    entry = _inline_cache.get(cache_key)
+    if entry is None:
+        entry = _build_inline(manifest_obj, config, key)
+        _inline_cache.set(cache_key, entry, len(entry[0]))
+    return entry
+
+
+def _build_inline(manifest_obj, config, key):
+    """returns the html and CSP hash for the asset, see manifest_inline"""
+    value = _load_from_manifest(manifest_obj, key=key, config=config)
+    if config['strict'] and \
+            config['loader'].is_missing(manifest_obj, key, value):
+        raise ManifestKeyNotFound(key)
+
+    tag = _INLINE_TAGS.get(os.path.splitext(key)[1].lower())
+    content = None if tag is None or _is_url(value) else _read_static(value)
+    text = _inline_text(content, tag, config['inline_max_size'])
+    if text is None:
+        return _link_tag(key, _resolve_url(value)), ''
+
+    digest = hashlib.sha256(content).digest()
+    return ('<{0}>{1}</{0}>'.format(tag, text),
+            "'sha256-{}'".format(base64.b64encode(digest).decode()))
+
+
+# extension -> tag assets are inlined into
+_INLINE_TAGS = {'.css': 'style', '.js': 'script', '.mjs': 'script'}
+
+
+def _inline_text(content, tag, max_size):
+    """
+    returns the content decoded for inlining into the tag, or None when it
+    is missing, too large, not text or would end the tag early
+    """
+    if content is None or len(content) > max_size:
+        return None
+    try:
+        text = content.decode()
+    except UnicodeDecodeError:
+        return None
+    lowered = text.lower()
+    if '</' + tag in lowered or (tag == 'script' and '<!--' in lowered):
+        return None
+    return text
+
+
+def _link_tag(key, url):
+    """returns the tag linking to an asset that isn't inlined"""
+    url = conditional_escape(url)
+    tag = _INLINE_TAGS.get(os.path.splitext(key)[1].lower())
+    if tag == 'style':
+        return '<link rel="stylesheet" href="{}">'.format(url)
+    if tag == 'script':
+        return '<script src="{}"></script>'.format(url)
+    content_type = mimetypes.guess_type(key)[0] or ''
+    kind = content_type.partition('/')[0]
+    if kind == 'image':
+        return '<link rel="preload" href="{}" as="image">'.format(url)
+    return '<link rel="preload" href="{}" as="{}" crossorigin>'.format(
+        url, 'font' if kind == 'font' else 'fetch')
+
+
+def _read_static(path):
+    """
+    returns the contents of a static file, found through the staticfiles
+    finders or else the staticfiles storage, or None if it can't be found
+    """
+    found = finders.find(path)
+    if found:
+        with open(found, 'rb') as static_file:
+            return static_file.read()
+    try:
+        with staticfiles_storage.open(path) as static_file:
+            return static_file.read()
+    except (OSError, ValueError):
+        return None
+
+
+def manifest_importmap(namespace=None, context=None):
+    """
+    Returns a ``<script type="importmap">`` tag mapping the bare name of every
+    manifest entry matching the ``importmap_patterns`` setting to its url.
+    The tag is built once per manifest version.
+
+    :param namespace: Optional name of one of the configured ``manifests``
+    :param context: Optional Django template context
+    :return: A string containing the script tag
+    """
+    return mark_safe(_get_importmap(namespace, context)[0])
+
+
+def manifest_importmap_hash(namespace=None, context=None):
+    """
+    Returns the CSP source expression, e.g. ``'sha256-...'``, matching the
+    script tag returned by ``manifest_importmap``.
+
+    :param namespace: Optional name of one of the configured ``manifests``
+    :param context: Optional Django template context
+    :return: A string to add to the ``script-src`` directive
+    """
+    return _get_importmap(namespace, context)[1]
+
+
+def _get_importmap(namespace=None, context=None):
+    """returns the import map script tag and its CSP hash"""
+    config = _get_config(namespace, context)
+    manifest_obj, version = _load_manifest(context=context, config=config)
+
+    def build():
+        body = _importmap_json(manifest_obj, config).decode()
+        digest = hashlib.sha256(body.encode()).digest()
+        return ('<script type="importmap">{}</script>'.format(body),
+                "'sha256-{}'".format(base64.b64encode(digest).decode()))
+
+    return _memoize('importmap', config, version, build)
+
+
+def _importmap_json(manifest_obj, config):
+    """
+    returns the import map for the manifest as compact JSON bytes, safe to
+    embed in a script tag
+    """
+    imports = {}
+    for key, url in _resolve_entries(
+            manifest_obj, config, config['importmap_patterns']).items():
+        imports[os.path.splitext(key)[0]] = url
+    return _dump_json({'imports': imports})
+
+
+def _dump_json(data):
+    """
+    serialises data to compact JSON bytes with ``<``, ``>`` and ``&``
+    escaped, so the output can be embedded in html as is
+    """
+    body = json.dumps(data, separators=(',', ':'))
+    for char, escaped in (('<', '\\u003c'), ('>', '\\u003e'),
+                          ('&', '\\u0026')):
+        body = body.replace(char, escaped)
+    return body.encode()
+
+
+def manifest_srcset(key, sizes=None, context=None):
+    """
+    Returns the ``srcset`` and, if given, ``sizes`` attributes for an image,
+    listing every variant of the same format found in the manifest, e.g.
+    ``hero.jpg``, ``hero@2x.jpg`` or ``hero-640w.jpg``. Variants are found
+    with the ``srcset_pattern`` setting and grouped once per manifest version.
+
+    :param key: string indicating the key of the image in the manifest file
+    :param sizes: Optional value of the ``sizes`` attribute
+    :param context: Optional Django template context
+    :return: A string of html attributes
+    """
+    name, ext, variants, config = _get_variants(key, context)
+
+    def build():
+        return _srcset_attrs(variants.get(ext, []), sizes)
+
+    version = _load_manifest(context=context, config=config)[1]
+    return mark_safe(_memoize('srcset', config, version, build, key, sizes))
+
+
+def manifest_picture(key, sizes=None, alt='', context=None):
+    """
+    Returns a ``<picture>`` element with a ``<source>`` for each other format
+    of the image found in the manifest, preferred formats from the
+    ``srcset_formats`` setting first, and an ``<img>`` for the format of the
+    key itself. See ``manifest_srcset``.
+
+    :param key: string indicating the key of the image in the manifest file
+    :param sizes: Optional value of the ``sizes`` attribute
+    :param alt: Optional alternative text of the image
+    :param context: Optional Django template context
+    :return: A string containing the picture element
+    """
+    name, ext, variants, config = _get_variants(key, context)
+
+    def build():
+        formats = config['srcset_formats']
+        others = sorted((other for other in variants if other != ext),
+                        key=lambda other: (formats.index(other)
+                                           if other in formats
+                                           else len(formats), other))
+        html = ['<picture>']
+        for other in others:
+            html.append('<source type="{}" {}>'.format(
+                _image_type(other), _srcset_attrs(variants[other], sizes)))
+        own = variants.get(ext, [])
+        src = own[0][2] if own else ''
+        html.append('<img src="{}" {} alt="{}"></picture>'.format(
+            conditional_escape(src), _srcset_attrs(own, sizes),
+            conditional_escape(alt)))
+        return ''.join(html)
+
+    version = _load_manifest(context=context, config=config)[1]
+    return mark_safe(_memoize('picture', config, version, build, key, sizes,
+                              alt))
+
+
+def _get_variants(key, context=None):
+    """
+    returns the name and format of the key, its variants by format and the
+    config, using the variant index of the manifest
+    """
+    namespace, key = _split_namespace(key)
+    config = _get_config(namespace, context)
+    manifest_obj, version = _load_manifest(context=context, config=config)
+    pattern = re.compile(config['srcset_pattern'])
+    match = pattern.match(key)
+    name, ext = (match['name'], match['ext']) if match \
+        else os.path.splitext(key)
+    ext = ext.lstrip('.')
+    index = _memoize('variants', config, version,
+                     lambda: _build_variants(manifest_obj, config, pattern))
+    variants = index.get(name)
+    if variants is None:
+        if config['strict']:
+            raise ManifestKeyNotFound(key)
+        variants = {ext: [(0, '', _resolve_missing(key, version))]}
+    return name, ext, variants, config
+
+
+def _build_variants(manifest_obj, config, pattern):
+    """
+    groups the manifest image entries matching the srcset pattern by name
+    and format, as ``{name: {format: [(order, descriptor, url)]}}`` sorted
+    by density or width. Entries without a descriptor come first.
+    """
+    loader = config['loader']
+    index = {}
+    for key in manifest_obj:
+        match = pattern.match(key)
+        if match is None or not _is_image(match['ext'], config):
+            continue
+        groups = match.groupdict()
+        if groups.get('width'):
+            order, descriptor = int(groups['width']), groups['width'] + 'w'
+        elif groups.get('density'):
+            order, descriptor = float(groups['density']), \
+                groups['density'] + 'x'
+        else:
+            order, descriptor = 0, ''
+        url = _resolve_url(loader.get_single_match(manifest_obj, key))
+        index.setdefault(match['name'], {}).setdefault(
+            match['ext'], []).append((order, descriptor, url))
+    for formats in index.values():
+        for variants in formats.values():
+            variants.sort(key=lambda variant: variant[:2])
+    return index
+
+
+def _srcset_attrs(variants, sizes=None):
+    """
+    returns the srcset and sizes attributes for the variants of one format.
+    Width and density descriptors can't be mixed, so when there are widths
+    the entry without a descriptor is left out.
+    """
+    widths = any(descriptor.endswith('w') for _, descriptor, _ in variants)
+    candidates = []
+    for order, descriptor, url in variants:
+        if not descriptor:
+            if widths:
+                continue
+            descriptor = '1x' if len(variants) > 1 else ''
+        candidates.append('{} {}'.format(url, descriptor).strip())
+    attrs = 'srcset="{}"'.format(conditional_escape(', '.join(candidates)))
+    if sizes:
+        attrs += ' sizes="{}"'.format(conditional_escape(sizes))
+    return attrs
+
+
+def _is_image(ext, config):
+    """checks if a file format is one of the srcset formats or an image"""
+    if ext.lower() in config['srcset_formats']:
+        return True
+    content_type = mimetypes.guess_type('image.' + ext, strict=False)[0]
+    return content_type is not None and content_type.startswith('image/')
+
+
+def _image_type(ext):
+    """returns the MIME type for an image format"""
+    return mimetypes.guess_type('image.' + ext)[0] or 'image/' + ext
+
+
+def manifest_prefetch(route=None, context=None):
+    """
+    Returns a ``<link rel="prefetch">`` tag for each asset the
+    ``prefetch_routes`` setting lists for the route, the chunks of the pages
+    likely to be visited next. The urls are resolved once per route and
+    manifest version.
+
+    :param route: Optional URL name, including its namespace, defaults to the
+        one of the current request's ``resolver_match``
+    :param context: Optional Django template context
+    :return: A string containing the link tags
+    """
+    if route is None:
+        route = _current_route(context)
+    return mark_safe('\n'.join(
+        '<link rel="prefetch" href="{}">'.format(conditional_escape(url))
+        for url in _get_prefetch_urls(route, context)))
+
+
+def _current_route(context=None):
+    """returns the URL name of the request in the context, if any"""
+    request = context.get('request') if context is not None else None
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else None
+
+
+def _get_prefetch_urls(route, context=None):
+    """
+    returns the unescaped urls to prefetch on the route. The keys and globs
+    of every rule whose URL name or pattern matches the route are resolved
+    together and kept for the versions of the manifests they use.
+    """
+    rules = APP_SETTINGS['prefetch_routes']
+    if not route or not rules:
+        return []
+    namespaces = {_split_namespace(entry)[0]
+                  for entries in rules.values() for entry in entries}
+    versions = tuple(_load_manifest(namespace, context)[1]
+                     for namespace in sorted(namespaces, key=str))
+
+    def build():
+        urls = {}
+        for pattern, entries in rules.items():
+            if pattern == route or fnmatch.fnmatchcase(route, pattern):
+                for entry in entries:
+                    urls.update(dict.fromkeys(_match_urls([entry], context)))
+        return tuple(urls)
+
+    return _memoize('prefetch', _get_config(None, context), versions, build,
+                    route)
+
+
+def _resolve_entries(manifest_obj, config, patterns=None, exclude=None):
+    """
+    returns a dict of the manifest keys matching any of the patterns, or all
+    keys when patterns is None, and none of the exclude patterns, mapped to
+    their unescaped urls
+    """
+    loader = config['loader']
+    return {
+        key: _resolve_url(loader.get_single_match(manifest_obj, key))
+        for key in _filter_keys(manifest_obj, patterns, exclude)
+    }
+
+
+def _filter_keys(manifest_obj, patterns=None, exclude=None):
+    """
+    returns the manifest keys matching any of the patterns, or all keys when
+    patterns is None, and none of the exclude patterns, in a single pass
+    """
+    if patterns is None:
+        patterns = ['*']
+    matches = compile_patterns(
+        list(patterns) + ['!' + pattern for pattern in exclude or ()])
+    return [key for key in manifest_obj if matches(key)]
+
+
+def _match_keys(manifest_obj, config, version, patterns=None, exclude=None):
+    """
+    returns the matching manifest keys, see ``_filter_keys``. Results are
+    indexed by pattern and kept for the lifetime of the manifest version.
+    """
+    patterns = tuple(patterns) if patterns is not None else None
+    exclude = tuple(exclude or ())
+    return _memoize(
+        'keys', config, version,
+        lambda: tuple(_filter_keys(manifest_obj, patterns, exclude)),
+        patterns, exclude)
+
+
+def manifest_precache(namespace=None, include=None, exclude=None,
+                      context=None):
+    """
+    Returns the service worker precache list for the manifest: one
+    ``{'url': ..., 'revision': ...}`` dict per entry, where revision is None
+    for hashed file names and a digest of the file's contents otherwise.
+    Built once per manifest version, so the returned list must not be
+    modified.
+
+    :param namespace: Optional name of one of the configured ``manifests``
+    :param include: Optional patterns of keys to include, defaults to the ``precache_include`` setting
+    :param exclude: Optional patterns of keys to exclude, defaults to the ``precache_exclude`` setting
+    :param context: Optional Django template context
+    :return: A list of dicts
+    """
+    return _get_precache(namespace, include, exclude, context)[0]
+
+
+def _get_precache(namespace=None, include=None, exclude=None, context=None):
+    """
+    returns the precache list, the list encoded as JSON in chunks of one
+    entry each, and an etag for the encoded list
+    """
+    config = _get_config(namespace, context)
+    manifest_obj, version = _load_manifest(context=context, config=config)
+    if include is None:
+        include = config['precache_include']
+    if exclude is None:
+        exclude = config['precache_exclude']
+    include, exclude = tuple(include), tuple(exclude)
+
+    def build():
+        loader = config['loader']
+        entries = []
+        for key in _match_keys(manifest_obj, config, version, include,
+                               exclude):
+            value = loader.get_single_match(manifest_obj, key)
+            entries.append({
+                'url': _resolve_url(value),
+                'revision': _precache_revision(key, value),
+            })
+        chunks = [b'[']
+        for index, entry in enumerate(entries):
+            chunks.append((b',\n' if index else b'\n') + _dump_json(entry))
+        chunks.append(b'\n]\n')
+        etag = '"{}"'.format(_make_version(b''.join(chunks)))
+        return entries, chunks, etag
+
+    return _memoize('precache', config, version, build, include, exclude)
+
+
+def _precache_revision(key, value):
+    """
+    returns None for a file whose name the bundler changed, as it carries a
+    hash of its contents already, or else a digest of the file's contents,
+    or of its name when the file can't be read
+    """
+    value = str(value)
+    if os.path.basename(value) != os.path.basename(key):
+        return None
+    content = None if _is_url(value) else _read_static(value)
+    return _make_version(value.encode() if content is None else content)
+
+
+def _memoize(name, config, version, build, *args):
+    """
+    returns the value built by ``build()``, computed once per manifest
+    version and kept in the derived value LRU
+    """
+    cache_key = (name, config.get('cache_key', 'webpack_manifest'), version,
+                 *args)
+    value = _derived_cache.get(cache_key)
+    if value is None:
+        value = build()
+        _derived_cache.set(cache_key, value)
+    return value
+
+
+def _clear_derived(*, setting, **kwargs):
+    """
+    drops derived values when a setting they depend on changes, e.g. while
+    running tests with ``override_settings``
+    """
+    if setting in ('STATIC_URL', 'STATICFILES_STORAGE', 'STORAGES',
+                   'MANIFEST_LOADER'):
+        _derived_cache.clear()
+        _inline_cache.clear()
+        _miss_cache.clear()
+        _block_cache.clear()
+        _pinned.clear()
+
+
+setting_changed.connect(_clear_derived)
+
+
+def _split_namespace(key):
+    """
+    splits a ``"namespace:key"`` string into its parts. Keys without a prefix
+    naming one of the configured ``manifests`` belong to the default manifest,
+    whose namespace is None.
+    """
+    namespace, sep, rest = key.partition(':')
+    if sep and namespace in APP_SETTINGS['manifests']:
+        return namespace, rest
+    return None, key
+
+
+def _get_config(namespace=None, context=None):
+    """
+    returns the settings for the named manifest. Settings not given for a
+    namespace fall back to the top level settings, and the ``resolver``
+    setting, if any, may override them for the current template context.
+    The returned settings carry the ``cache_key`` the manifest is stored
+    under.
+    """
+    resolver = APP_SETTINGS['resolver']
+    overrides = resolver(context, namespace) if resolver else None
+    if namespace is None and not overrides:
+        return APP_SETTINGS
+
+    config = dict(APP_SETTINGS)
+    cache_key = 'webpack_manifest'
+    if namespace is not None:
+        config.update(APP_SETTINGS['manifests'][namespace])
+        cache_key += ':{}'.format(namespace)
+    if overrides:
+        config.update(overrides)
+        cache_key += ':{}'.format(
+            _make_version(repr(sorted(overrides.items())).encode()))
+    config['cache_key'] = cache_key
+    return config
+
+
+def _get_manifest(namespace=None, context=None):
     """
     Returns the manifest file converted into a dict. If caching is enabled
     this will return the cached manifest.
     """
-    cached_manifest = cache.get('webpack_manifest')
-    if APP_SETTINGS['cache'] and cached_manifest:
-        return cached_manifest
+    return _load_manifest(namespace, context)[0]
+
+
+def _load_manifest(namespace=None, context=None, config=None):
+    """
+    Returns a ``(manifest, version)`` tuple, where version is a short digest
+    of the manifest contents computed once per load. Each namespace is read
+    and cached separately, and only when first asked for. Within a snapshot
+    the first result is reused without checking whether it is still fresh.
+    """
+    if config is None:
+        config = _get_config(namespace, context)
+    cache_key = config.get('cache_key', 'webpack_manifest')
+
+    snapshot = _get_snapshot(context)
+    if snapshot is not None:
+        pinned = snapshot.get(cache_key)
+        if pinned is None:
+            pinned = snapshot[cache_key] = _fetch_manifest(config, cache_key)
+        return pinned
+    return _fetch_manifest(config, cache_key)
+
+
+@contextmanager
+def manifest_snapshot():
+    """
+    Pins every manifest to the version first seen inside the block, so that
+    all lookups made while rendering one response agree with each other.
+    Yields a dict of the pinned ``(manifest, version)`` tuples. Nested blocks
+    share the snapshot of the outermost one. Used by the middleware in
+    ``manifest_loader.middleware``.
+    """
+    pinned = _snapshot.get()
+    if pinned is not None:
+        yield pinned
+        return
+    pinned = {}
+    token = _snapshot.set(pinned)
+    try:
+        yield pinned
+    finally:
+        _snapshot.reset(token)
+
+
+def manifest_version(namespace=None, context=None):
+    """
+    Returns the version of the manifest, a short digest of its contents that
+    is computed once per load and changes whenever the manifest does.
+
+    :param namespace: Optional name of one of the configured ``manifests``
+    :param context: Optional Django template context
+    :return: A string of 16 hex digits
+    """
+    return _load_manifest(namespace, context)[1]
+
+
+def manifest_key_prefix(key_prefix='', namespace=None):
+    """
+    Returns a cache key prefix that changes whenever the manifest does,
+    suitable for the ``key_prefix`` argument of ``cache_page``. See also
+    ``manifest_loader.decorators.manifest_cache_page``.
+
+    :param key_prefix: Optional prefix to prepend
+    :param namespace: Optional name of one of the configured ``manifests``
+    :return: A string
+    """
+    version = manifest_version(namespace)
+    return '{}.{}'.format(key_prefix, version) if key_prefix else version
 
-    if APP_SETTINGS['output_dir']:
-        manifest_path = os.path.join(APP_SETTINGS['output_dir'],
-                                     APP_SETTINGS['manifest_file'])
+
+def _versions_digest(pinned):
+    """returns a single version for all the manifests in a snapshot"""
+    versions = sorted(version for data, version in pinned.values())
+    if len(versions) == 1:
+        return versions[0]
+    return _make_version(','.join(versions).encode())
+
+
+def _get_snapshot(context=None):
+    """
+    returns the pinned manifests for the current request, or for the current
+    render when no request snapshot is active.
+    """
+    snapshot = _snapshot.get()
+    if snapshot is None and isinstance(context, BaseContext):
+        snapshot = getattr(context, '_manifest_snapshot', None)
+        if snapshot is None:
+            snapshot = context._manifest_snapshot = {}
+    return snapshot
+
+
+class _RecordingSnapshot(dict):
+    """
+    a snapshot recording the cache keys of the manifests looked up through
+    it, and passing the manifests it pins on to the snapshot it wraps
+    """
+    def __init__(self, outer=None):
+        super().__init__(outer or {})
+        self.outer = outer
+        self.used = set()
+
+    def get(self, key, default=None):
+        self.used.add(key)
+        return super().get(key, default)
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        if self.outer is not None:
+            self.outer[key] = value
+
+
+@contextmanager
+def _recording_snapshot(context=None):
+    """
+    yields the set of namespaces whose manifests are used inside the block,
+    filled in when the block exits, with ``_TABLE_KEY`` added if the lookup
+    table is
+    """
+    recorder = _RecordingSnapshot(_get_snapshot(context))
+    namespaces = set()
+    token = _snapshot.set(recorder)
+    try:
+        yield namespaces
+    finally:
+        _snapshot.reset(token)
+    for namespace in [None, *APP_SETTINGS['manifests']]:
+        config = _get_config(namespace, context)
+        if config.get('cache_key', 'webpack_manifest') in recorder.used:
+            namespaces.add(namespace)
+    if _TABLE_KEY in recorder.used:
+        namespaces.add(_TABLE_KEY)
+
+
+def _block_key(node_key, namespaces, context, vary_on=()):
+    """
+    returns the key a rendered ``manifest_block`` is stored under, which
+    changes with the versions of the manifests and lookup table it uses
+    """
+    versions = tuple(
+        (_TABLE_KEY, (_load_lookup_table(context) or (None, None))[1])
+        if namespace == _TABLE_KEY else
+        (_get_config(namespace, context).get('cache_key', 'webpack_manifest'),
+         _load_manifest(namespace, context)[1])
+        for namespace in sorted(namespaces, key=str))
+    return node_key + (versions, context.autoescape, tuple(vary_on))
+
+
+def _get_block(key):
+    """
+    returns the html stored for the block, from the in-process LRU or the
+    cache named by the ``block_cache`` setting, or None
+    """
+    html = _block_cache.get(key)
+    if html is None and APP_SETTINGS['block_cache']:
+        html = caches[APP_SETTINGS['block_cache']].get(_shared_block_key(key))
+        if html is not None:
+            _block_cache.set(key, html, len(html))
+    return html
+
+
+def _set_block(key, html):
+    _block_cache.set(key, html, len(html))
+    if APP_SETTINGS['block_cache']:
+        caches[APP_SETTINGS['block_cache']].set(_shared_block_key(key), html)
+
+
+def _get_block_namespaces(node_key):
+    """
+    returns the namespaces used by the block, as found by this or another
+    process, from the in-process LRU or the cache named by the
+    ``block_cache`` setting, or None
+    """
+    namespaces = _block_namespaces.get(node_key)
+    if namespaces is None and APP_SETTINGS['block_cache']:
+        namespaces = caches[APP_SETTINGS['block_cache']].get(
+            _shared_block_key(node_key))
+        if namespaces is not None:
+            _block_namespaces.set(node_key, namespaces)
+    return namespaces
+
+
+def _set_block_namespaces(node_key, namespaces):
+    _block_namespaces.set(node_key, namespaces)
+    if APP_SETTINGS['block_cache']:
+        caches[APP_SETTINGS['block_cache']].set(
+            _shared_block_key(node_key), namespaces)
+
+
+def _shared_block_key(key):
+    return 'manifest_block:' + _make_version(repr(key).encode())
+
+
+def _fetch_manifest(config, cache_key):
+    """
+    loads the manifest described by config, see ``_load_manifest``. With
+    the ``manual_reload`` setting on, the manifest is only read once and
+    then replaced by ``manifest_loader.reload.reload_manifests``.
+    """
+    if not config['manual_reload']:
+        return _refresh_manifest(config, cache_key)
+    pinned = _pinned.get(cache_key)
+    if pinned is None:
+        loaded = _refresh_manifest(config, cache_key)
+        with _pinned_lock:
+            pinned = _pinned.get(cache_key)
+            if pinned is None:
+                pinned = (config, loaded)
+                _pin(cache_key, pinned)
+    return pinned[1]
+
+
+def _pin(cache_key, pinned):
+    """stores a ``(config, (manifest, version))`` tuple in ``_pinned``"""
+    _pinned.set(cache_key, pinned, _manifest_nbytes(pinned[1][0]))
+
+
+def _refresh_manifest(config, cache_key):
+    """
+    reads the manifest, tracking reloads, see ``_fetch_manifest``. The
+    manifest is only reshaped by the loader's ``transform`` when its version
+    or loader changed, the result being kept with the version in ``_loaded``.
+    """
+    data, version = _fetch_manifest_version(config, cache_key)
+    loader = config['loader']
+    transform = getattr(loader, 'transform', LoaderABC.transform)
+    if transform is not LoaderABC.transform:
+        previous = _loaded.get(cache_key)
+        if previous is not None and previous[1:] == (version, loader):
+            return previous[0], version
+        data = transform(data)
+    _track_reload(cache_key, data, version, loader)
+    return data, version
+
+
+def _track_reload(cache_key, data, version, loader):
+    """
+    records the newly loaded manifest version. When it replaces another
+    version, the two are diffed and only the derived values depending on
+    changed keys are dropped, see ``_carry_over``, before sending the
+    ``manifest_changed`` signal.
+    """
+    with _loaded_lock:
+        previous = _loaded.get(cache_key)
+        if previous is not None and previous[1:] == (version, loader):
+            return
+        _loaded.set(cache_key, (data, version, loader),
+                    _manifest_nbytes(data))
+    if previous is None or previous[1] == version:
+        return
+
+    old_data, old_version, old_loader = previous
+    added, removed, changed = _diff_manifests(old_data, data)
+    if changed is not None:
+        _carry_over(cache_key, old_version, version,
+                    added | removed | changed)
+    manifest_changed.send(
+        sender=None, cache_key=cache_key, old_version=old_version,
+        new_version=version, added=added, removed=removed, changed=changed)
+
+
+def _manifest_nbytes(data):
+    """returns the size of the manifest as compact JSON, 0 if it isn't JSON"""
+    try:
+        return len(json.dumps(data, separators=(',', ':')))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _diff_manifests(old, new):
+    """
+    returns the sets of keys added, removed and changed between manifests,
+    or three Nones if they aren't dicts and can't be compared key by key
+    """
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        return None, None, None
+    added = new.keys() - old.keys()
+    removed = old.keys() - new.keys()
+    changed = {key for key in old.keys() & new.keys()
+               if old[key] != new[key]}
+    return set(added), set(removed), changed
+
+
+def _carry_over(cache_key, old_version, new_version, keys):
+    """
+    copies the values derived from the old manifest version that don't
+    depend on any of the given keys over to the new version: resolved urls
+    of other keys, match results whose patterns match none of the keys,
+    inlined assets and missing key results.
+    """
+    for entry_key, value, nbytes in _derived_cache.items():
+        name, entry_cache_key, version, *args = entry_key
+        if entry_cache_key != cache_key or version != old_version:
+            continue
+        if name == 'urls':
+            value = {key: url for key, url in value.items()
+                     if key not in keys}
+        elif name == 'match':
+            matches = compile_patterns(args[0])
+            if any(matches(key) for key in keys):
+                continue
+        elif name == 'keys':
+            patterns, exclude = args
+            matches = compile_patterns(
+                list(patterns or ['*']) + ['!' + pattern
+                                           for pattern in exclude])
+            if any(matches(key) for key in keys):
+                continue
+        else:
+            continue
+        _derived_cache.set((name, cache_key, new_version, *args), value)
+
+    for entry_key, value, nbytes in _inline_cache.items():
+        entry_cache_key, version, key = entry_key
+        if entry_cache_key == cache_key and version == old_version and \
+                key not in keys:
+            _inline_cache.set((cache_key, new_version, key), value, nbytes)
+
+    for entry_key, value, nbytes in _miss_cache.items():
+        version, key = entry_key
+        if version == old_version and key not in keys:
+            _miss_cache.set((new_version, key), value, nbytes)
+
+
+def _fetch_manifest_version(config, cache_key):
+    """reads the manifest described by config, see ``_load_manifest``"""
+    if config['dev_server_url']:
+        return get_dev_server_manifest(config['dev_server_url'],
+                                       config['dev_server_refresh_interval'])
+
+    version_key = cache_key + '_version'
+
+    cached_manifest = cache.get(cache_key)
+    if config['cache'] and cached_manifest:
+        version = cache.get(version_key)
+        if version is None:
+            version = _make_version(
+                json.dumps(cached_manifest, sort_keys=True).encode())
+            cache.set(version_key, version)
+        return cached_manifest, version
+
+    if config['storage']:
+        manifest_path = get_local_copy(config['storage'],
+                                       config['manifest_file'],
+                                       config['storage_cache_dir'],
+                                       config['storage_refresh_interval'])
+    elif config['output_dir']:
+        manifest_path = os.path.join(config['output_dir'],
+                                     config['manifest_file'])
     else:
-        manifest_path = _find_manifest_path()
+        manifest_path = _find_manifest_path(config['manifest_file'])
+
+    data, version = _read_manifest(manifest_path)
+
+    if config['cache']:
+        cache.set_many({cache_key: data, version_key: version})
+
+    return data, version
+
+
+def _read_manifest(manifest_path):
+    """
+    reads and parses the manifest file at manifest_path. Parsed manifests are
+    kept in a bounded in-process LRU and only parsed again once the file's
+    modification time or size changes.
+    """
+    try:
+        stat = os.stat(manifest_path)
+    except FileNotFoundError:
+        raise WebpackManifestNotFound(manifest_path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+
+    entry = _manifest_cache.get(manifest_path)
+    if entry is not None and entry[0] == stamp:
+        return entry[1], entry[2]
 
     try:
-        with open(manifest_path) as manifest_file:
-            data = json.load(manifest_file)
+        with open(manifest_path, 'rb') as manifest_file:
+            raw = manifest_file.read()
     except FileNotFoundError:
         raise WebpackManifestNotFound(manifest_path)
+    data = json.loads(raw)
+    version = _make_version(raw)
+    _manifest_cache.set(manifest_path, (stamp, data, version), len(raw))
+    return data, version
 
-    if APP_SETTINGS['cache']:
-        cache.set('webpack_manifest', data)
 
-    return data
+def _make_version(raw):
+    """returns a short, stable digest of the raw manifest contents"""
+    return hashlib.blake2b(raw, digest_size=8).hexdigest()
 
 
-def _find_manifest_path():
+def _find_manifest_path(manifest_file=None):
     """
     combs through settings.STATICFILES_DIRS to find the path of the manifest
     file.
     """
+    manifest_file = manifest_file or APP_SETTINGS['manifest_file']
     static_dirs = settings.STATICFILES_DIRS
     if len(static_dirs) == 1:
-        return os.path.join(static_dirs[0], APP_SETTINGS['manifest_file'])
+        return os.path.join(static_dirs[0], manifest_file)
     for static_dir in static_dirs:
-        manifest_path = os.path.join(static_dir, APP_SETTINGS['manifest_file'])
+        manifest_path = os.path.join(static_dir, manifest_file)
         if os.path.isfile(manifest_path):
             return manifest_path
     raise WebpackManifestNotFound('settings.STATICFILES_DIRS')
@@ -117,12 +1430,12 @@ def _get_value(string, context):
     return context.get(string, '')
 
 
-def _load_from_manifest(manifest, key=None, pattern=None):
+def _load_from_manifest(manifest, key=None, pattern=None, config=None):
     """
     uses the loader defined in settings to get the values
     from the manifest file
     """
-    loader = APP_SETTINGS['loader']
+    loader = (config or APP_SETTINGS)['loader']
 
     if not issubclass(loader, LoaderABC):
         raise CustomManifestLoaderNotValid
@@ -148,10 +1461,136 @@ def _make_url(manifest_value, context=None):
     """
     uses the django staticfiles app to get the url of the file being asked for
     """
+    return _escape_url(_resolve_url(manifest_value), context)
+
+
+def _resolve_url(manifest_value):
+    """
+    returns the unescaped url for a value found in the manifest, served from
+    the origin the ``url_prefixes`` setting picks for it, if any. The rules
+    are always read from the top level settings.
+    """
     if _is_url(manifest_value):
-        url = manifest_value
-    else:
-        url = StaticNode.handle_simple(manifest_value)
+        return manifest_value
+    url = StaticNode.handle_simple(manifest_value)
+    rules = APP_SETTINGS['url_prefixes']
+    if rules:
+        origin = _pick_origin(_compile_url_prefixes(tuple(
+            (_freeze(pattern), _freeze(origins)) for pattern, origins in rules
+        )), manifest_value)
+        if origin is not None:
+            parts = urlsplit(url)
+            url = origin.rstrip('/') + urlunsplit(
+                ('', '', parts.path, parts.query, parts.fragment))
+    return url
+
+
+def _freeze(value):
+    """turns lists into tuples, so rules can be cached"""
+    return tuple(value) if isinstance(value, list) else value
+
+
+@functools.lru_cache(maxsize=8)
+def _compile_url_prefixes(rules):
+    """compiles the ``url_prefixes`` rules into (matches, origins) pairs"""
+    return [(compile_patterns(pattern), origins) for pattern, origins in rules]
+
+
+def _pick_origin(rules, manifest_value):
+    """
+    returns the origin of the first rule matching the value, or None. Rules
+    with several origins pick one by rendezvous hashing of the value, so an
+    asset keeps its origin across processes, and most assets keep theirs when
+    origins are added or removed.
+    """
+    for matches, origins in rules:
+        if matches(manifest_value):
+            if isinstance(origins, str):
+                return origins
+            return max(origins, key=lambda origin: hashlib.blake2b(
+                '{}\0{}'.format(origin, manifest_value).encode(),
+                digest_size=8).digest())
+    return None
+
+
+def manifest_preconnect(namespace=None, context=None):
+    """
+    Returns a ``<link rel="preconnect">`` tag for each origin other than the
+    site's that assets of the manifest are served from, with ``crossorigin``
+    for origins serving fonts or scripts. Computed once per manifest version.
+
+    :param namespace: Optional name of one of the configured ``manifests``
+    :param context: Optional Django template context
+    :return: A string containing the link tags
+    """
+    config = _get_config(namespace, context)
+    manifest_obj, version = _load_manifest(context=context, config=config)
+
+    def build():
+        origins = {}
+        for key, url in _resolve_entries(manifest_obj, config).items():
+            parts = urlsplit(url)
+            if parts.scheme and parts.netloc:
+                origin = '{}://{}'.format(parts.scheme, parts.netloc)
+                cors = os.path.splitext(parts.path)[1] in _CORS_EXTENSIONS
+                origins[origin] = origins.get(origin, False) or cors
+        return mark_safe('\n'.join(
+            '<link rel="preconnect" href="{}"{}>'.format(
+                conditional_escape(origin), ' crossorigin' if cors else '')
+            for origin, cors in origins.items()))
+
+    return _memoize('preconnect', config, version, build)
+
+
+# files browsers fetch in CORS mode, needing a crossorigin preconnect
+_CORS_EXTENSIONS = {'.woff', '.woff2', '.ttf', '.otf', '.eot', '.js', '.mjs'}
+
+
+def _escape_url(url, context=None):
+    """escapes the url if the template context has autoescaping turned on"""
     if context is not None and context.autoescape:
         url = conditional_escape(url)
     return url
+
+
+def _resolve_missing(key, version):
+    """
+    resolves a key that isn't in the manifest. The outcome, including errors
+    raised by the staticfiles storage, is remembered per manifest version so
+    repeated misses skip the url validation and storage lookup, and the
+    warning is logged at most once per ``miss_warning_interval`` seconds.
+    """
+    entry = _miss_cache.get((version, key))
+    if entry is None:
+        try:
+            result = _resolve_url(key)
+        except ValueError as error:
+            # the error is raised afresh on each miss, a single instance
+            # would collect the traceback of every render raising it
+            result = (type(error), error.args)
+        entry = [result, None]
+        _miss_cache.set((version, key), entry)
+
+    now = time.monotonic()
+    if entry[1] is None or \
+            now - entry[1] >= APP_SETTINGS['miss_warning_interval']:
+        entry[1] = now
+        logger.warning('Key %r not found in the manifest', key)
+
+    if isinstance(entry[0], tuple):
+        error_type, args = entry[0]
+        raise error_type(*args)
+    return entry[0]
+
+
+def _check_key(key):
+    """
+    raises ManifestKeyNotFound if the key is not in the manifest. Used by
+    strict mode to fail when a template is compiled rather than on render.
+    """
+    namespace, key = _split_namespace(key)
+    config = _get_config(namespace)
+    manifest_obj = _load_manifest(config=config)[0]
+    value = _load_from_manifest(manifest_obj, key=key, config=config)
+    if config['loader'].is_missing(manifest_obj, key, value):
+        raise ManifestKeyNotFound(key)
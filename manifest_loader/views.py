@@ -0,0 +1,118 @@
+import re
+import time
+
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from django.utils.text import compress_string
+
+from manifest_loader.utils import APP_SETTINGS, _get_config, \
+    _load_manifest, _memoize, _resolve_entries, _dump_json, _importmap_json, \
+    _make_version, _get_precache
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+re_accepts_br = re.compile(r'\bbr\b')
+re_accepts_gzip = re.compile(r'\bgzip\b')
+
+
+def manifest_json(request, namespace=None):
+    """
+    Serves the manifest entries matching the ``json_patterns`` setting, or
+    the whole manifest if it isn't set, as a JSON object mapping each key to
+    its url.
+    """
+    return _serve(request, 'json', namespace, _manifest_json,
+                  'application/json')
+
+
+def importmap_json(request, namespace=None):
+    """
+    Serves the import map built from the ``importmap_patterns`` setting, the
+    same one rendered by the ``manifest_importmap`` tag.
+    """
+    return _serve(request, 'importmap_json', namespace, _importmap_json,
+                  'application/importmap+json')
+
+
+def precache_json(request, namespace=None):
+    """
+    Serves the service worker precache list, a JSON array of
+    ``{"url": ..., "revision": ...}`` objects for the entries matching the
+    ``precache_include`` and ``precache_exclude`` settings. The encoded list
+    is cached per manifest version and streamed one entry at a time.
+    """
+    _check_namespace(namespace)
+    entries, chunks, etag = _get_precache(namespace,
+                                          context={'request': request})
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = StreamingHttpResponse(iter(chunks),
+                                         content_type='application/json')
+    response['ETag'] = etag
+    return response
+
+
+def _manifest_json(manifest_obj, config):
+    return _dump_json(_resolve_entries(manifest_obj, config,
+                                       config['json_patterns']))
+
+
+class _Payload:
+    """
+    A response body encoded once per manifest version, along with its
+    compressed variants and the validators used for conditional requests.
+    """
+    def __init__(self, body):
+        self.bodies = {'': body, 'gzip': compress_string(body)}
+        if brotli is not None:
+            self.bodies['br'] = brotli.compress(body)
+        self.etag = '"{}"'.format(_make_version(body))
+        self.last_modified = int(time.time())
+
+    def etag_for(self, encoding):
+        if not encoding:
+            return self.etag
+        return '{}-{}"'.format(self.etag[:-1], encoding)
+
+
+def _serve(request, name, namespace, build_body, content_type):
+    _check_namespace(namespace)
+    context = {'request': request}
+    config = _get_config(namespace, context)
+    manifest_obj, version = _load_manifest(context=context, config=config)
+    payload = _memoize(name, config, version,
+                       lambda: _Payload(build_body(manifest_obj, config)))
+
+    encoding = _accepted_encoding(request, payload)
+    etag = payload.etag_for(encoding)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=payload.last_modified)
+    if response is None:
+        response = HttpResponse(payload.bodies[encoding],
+                                content_type=content_type)
+        if encoding:
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(payload.last_modified)
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def _check_namespace(namespace):
+    """raises Http404 unless namespace names one of the ``manifests``"""
+    if namespace is not None and namespace not in APP_SETTINGS['manifests']:
+        raise Http404('No manifest named {!r}'.format(namespace))
+
+
+def _accepted_encoding(request, payload):
+    """returns the best content encoding the client accepts"""
+    accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    if 'br' in payload.bodies and re_accepts_br.search(accept_encoding):
+        return 'br'
+    if re_accepts_gzip.search(accept_encoding):
+        return 'gzip'
+    return ''
@@ -1,16 +1,67 @@
+import asyncio
+import base64
+import gzip
+import hashlib
+import io
+import json
+import os
+import signal
+import tempfile
+import threading
+import time
+import traceback
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from asgiref.sync import async_to_sync
 from django.conf import settings
-from django.test import SimpleTestCase
-from django.template import TemplateSyntaxError, Context, Template
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command, CommandError
+from django.http import Http404, HttpResponse
+from django.middleware.http import ConditionalGetMiddleware
+from django.test import SimpleTestCase, RequestFactory
+from django.template import TemplateSyntaxError, Context, Template, \
+    RequestContext, Engine
 from django.core.cache import cache
 from django.apps import AppConfig
+from unittest import mock
 
 from manifest_loader.utils import _find_manifest_path, \
-    _get_manifest, APP_SETTINGS, _is_quoted_string, _is_url
+    _get_manifest, APP_SETTINGS, _is_quoted_string, _is_url, manifest, \
+    manifest_match, _miss_cache, _manifest_cache, _read_manifest, \
+    _derived_cache, _importmap_json, manifest_importmap, manifest_precache, \
+    manifest_inline, manifest_inline_hash, _inline_cache, _read_static, \
+    ManifestAssets, _load_manifest, _loaded, manifest_version, \
+    manifest_key_prefix, _pinned, manifest_picture, \
+    manifest_prefetch, _block_cache, manifest_async, manifest_match_async, \
+    manifest_snapshot, _block_namespaces, _CACHES
+from manifest_loader.middleware import snapshot_middleware, \
+    etag_middleware, prefetch_middleware, differential_middleware
+from manifest_loader.decorators import manifest_cache_page
+from manifest_loader.storage import get_local_copy, sync_local_copies, \
+    _syncs, StorageSync
+from manifest_loader.devserver import _dev_servers
+from manifest_loader.management.commands.manifest_scan import \
+    find_manifest_usages
+from manifest_loader.management.commands.manifest_bench import \
+    percentile, clear_caches
+from manifest_loader.management.commands.manifest_budget import parse_size
+from manifest_loader import instrumentation, utils
+from manifest_loader.signals import manifest_changed
+from manifest_loader.views import manifest_json, importmap_json, _Payload, \
+    precache_json
+from manifest_loader.checks import check_manifest
+from manifest_loader.lru import LRUCache
+from manifest_loader.differential import differential_resolver, \
+    classify_user_agent, is_legacy_client, _ua_cache
+from manifest_loader.memory import deep_sizeof, footprint, memory_report
+from manifest_loader.reload import reload_manifests, install_signal_handlers
 
 from manifest_loader.apps import ManifestLoader
 from manifest_loader.exceptions import WebpackManifestNotFound, \
-    CustomManifestLoaderNotValid
-from manifest_loader.loaders import LoaderABC, DefaultLoader
+    CustomManifestLoaderNotValid, ManifestKeyNotFound
+from manifest_loader.loaders import LoaderABC, DefaultLoader, \
+    compile_patterns, EsbuildLoader, RollupLoader, ParcelLoader
 
 NEW_STATICFILES_DIRS = [
     settings.BASE_DIR / 'foo',
@@ -26,6 +77,31 @@ def render_template(string, context=None):
     return Template(string).render(context)
 
 
+class OutputDirMixin:
+    """
+    serves the default manifest from a temporary ``output_dir``, written
+    with ``write_manifest``
+    """
+    def setUp(self):
+        super().setUp()
+        self.output_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.output_dir.name, 'manifest.json')
+        self.writes = 0
+        APP_SETTINGS.update({'output_dir': self.output_dir.name})
+
+    def tearDown(self):
+        APP_SETTINGS.update({'output_dir': None})
+        self.output_dir.cleanup()
+        super().tearDown()
+
+    def write_manifest(self, data):
+        with open(self.path, 'w') as manifest_file:
+            json.dump(data, manifest_file)
+        # make sure each write has a distinct modification time
+        self.writes += 1
+        os.utime(self.path, ns=(0, self.writes * 10 ** 9))
+
+
 class IsUrlTests(SimpleTestCase):
     def test_is_url(self):
         self.assertTrue(_is_url('http://localhost:8080'))
@@ -309,3 +385,1754 @@ class LoaderABCTests(SimpleTestCase):
     def test_methods_not_implemented(self):
         self.assertIsNone(LoaderABC.get_single_match('foo', 'bar'))
         self.assertIsNone(LoaderABC.get_multi_match('foo', 'bar'))
+
+
+class BundlerLoaderTests(SimpleTestCase):
+    def tearDown(self):
+        APP_SETTINGS.update({'output_dir': None, 'loader': DefaultLoader})
+
+    def use_manifest(self, data, loader):
+        _loaded.clear()
+        output_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(output_dir.cleanup)
+        with open(os.path.join(output_dir.name, 'manifest.json'),
+                  'w') as manifest_file:
+            json.dump(data, manifest_file)
+        APP_SETTINGS.update({'output_dir': output_dir.name, 'loader': loader})
+
+    def test_esbuild(self):
+        self.use_manifest({'inputs': {}, 'outputs': {
+            'static/dist/main-AB12.js': {
+                'entryPoint': 'src/main.ts',
+                'cssBundle': 'static/dist/main-CD34.css',
+            },
+            'static/dist/main-CD34.css': {},
+            'static/dist/chunk-EF56.js': {},
+        }}, EsbuildLoader)
+        self.assertEqual(manifest('main.js'), '/static/dist/main-AB12.js')
+        self.assertEqual(manifest('main.css'), '/static/dist/main-CD34.css')
+        self.assertEqual(manifest('./src/main.ts'),
+                         '/static/dist/main-AB12.js')
+        self.assertEqual(manifest('dist/chunk-EF56.js'),
+                         '/static/dist/chunk-EF56.js')
+        self.assertEqual(
+            manifest_match('*.js', '{match}').split('\n'),
+            ['/static/dist/main-AB12.js', '/static/dist/chunk-EF56.js']
+        )
+
+    def test_rollup(self):
+        self.use_manifest({'src/main.ts': {
+            'file': 'assets/main-4889e940.js',
+            'name': 'main',
+            'src': 'src/main.ts',
+            'isEntry': True,
+            'css': ['assets/main-b1.css'],
+        }}, RollupLoader)
+        self.assertEqual(manifest('main.js'), '/static/assets/main-4889e940.js')
+        self.assertEqual(manifest('main.css'), '/static/assets/main-b1.css')
+        self.assertEqual(manifest('src/main.ts'),
+                         '/static/assets/main-4889e940.js')
+
+    def test_parcel(self):
+        self.use_manifest({'src/index.ts': '/index.8f2a.js'}, ParcelLoader)
+        self.assertEqual(manifest('index.js'), '/static/index.8f2a.js')
+        self.assertEqual(manifest('src/index.ts'), '/static/index.8f2a.js')
+
+    def test_transform_once_per_version(self):
+        self.use_manifest({'src/index.ts': '/index.8f2a.js'}, ParcelLoader)
+        with mock.patch.object(ParcelLoader, 'entries',
+                               wraps=ParcelLoader.entries) as entries:
+            for _ in range(3):
+                manifest('index.js')
+                # not kept with the derived values, which may be evicted
+                _derived_cache.clear()
+        self.assertEqual(entries.call_count, 1)
+
+    def test_transform_again_for_another_loader(self):
+        self.use_manifest({'src/index.ts': '/index.8f2a.js'}, ParcelLoader)
+        self.assertEqual(manifest('index.js'), '/static/index.8f2a.js')
+        APP_SETTINGS.update({'loader': DefaultLoader})
+        _derived_cache.clear()
+        self.assertEqual(manifest('index.js'), '/static/index.js')
+
+    def test_default_loader_untouched(self):
+        data = {'a': 'b'}
+        self.assertIs(DefaultLoader.transform(data), data)
+
+
+class LRUCacheTests(SimpleTestCase):
+    def test_evicts_least_recently_used(self):
+        lru = LRUCache(2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        self.assertEqual(lru.get('a'), 1)
+        lru.set('c', 3)
+        self.assertNotIn('b', lru)
+        self.assertEqual(len(lru), 2)
+
+    def test_evicts_by_size(self):
+        lru = LRUCache(10, maxbytes=100)
+        lru.set('a', 1, nbytes=60)
+        lru.set('b', 2, nbytes=30)
+        lru.set('c', 3, nbytes=30)
+        self.assertNotIn('a', lru)
+        self.assertEqual(lru.nbytes, 60)
+
+
+class MissingKeyTests(SimpleTestCase):
+    def setUp(self):
+        _miss_cache.clear()
+
+    def tearDown(self):
+        _miss_cache.clear()
+
+    def test_miss_is_cached(self):
+        with mock.patch('manifest_loader.utils.StaticNode.handle_simple',
+                        return_value='/static/foo.js') as handle_simple:
+            with self.assertLogs('manifest_loader', 'WARNING') as logs:
+                self.assertEqual(manifest('foo.js'), '/static/foo.js')
+                self.assertEqual(manifest('foo.js'), '/static/foo.js')
+        self.assertEqual(handle_simple.call_count, 1)
+        self.assertEqual(len(logs.output), 1)
+
+    def test_storage_error_is_cached(self):
+        with mock.patch('manifest_loader.utils.StaticNode.handle_simple',
+                        side_effect=ValueError('missing')) as handle_simple:
+            with self.assertLogs('manifest_loader', 'WARNING'):
+                errors = []
+                for _ in range(3):
+                    with self.assertRaisesMessage(ValueError,
+                                                  'missing') as raised:
+                        manifest('foo.js')
+                    errors.append(raised.exception)
+        self.assertEqual(handle_simple.call_count, 1)
+        # each miss raises a new error, not one collecting tracebacks
+        self.assertIsNot(errors[0], errors[1])
+        self.assertEqual(
+            len(traceback.extract_tb(errors[1].__traceback__)),
+            len(traceback.extract_tb(errors[2].__traceback__)))
+
+    def test_miss_cache_is_bounded(self):
+        _miss_cache.maxsize, maxsize = 2, _miss_cache.maxsize
+        with self.assertLogs('manifest_loader', 'WARNING'):
+            for key in ('a.js', 'b.js', 'c.js'):
+                manifest(key)
+        self.assertEqual(len(_miss_cache), 2)
+        _miss_cache.maxsize = maxsize
+
+
+class StrictModeTests(SimpleTestCase):
+    def setUp(self):
+        APP_SETTINGS.update({'strict': True})
+
+    def tearDown(self):
+        APP_SETTINGS.update({'strict': False})
+
+    def test_raises_on_render(self):
+        with self.assertRaises(ManifestKeyNotFound):
+            manifest('foo.js')
+
+    def test_raises_on_compile(self):
+        with self.assertRaises(TemplateSyntaxError):
+            Template('{% load manifest %}{% manifest "foo.js" %}')
+
+    def test_found_key_compiles(self):
+        self.assertEqual(
+            render_template('{% load manifest %}{% manifest "main.js" %}'),
+            '/static/main.e12dfe2f9b185dea03a4.js'
+        )
+
+    def test_system_check(self):
+        self.assertEqual(check_manifest(None), [])
+        APP_SETTINGS.update({'output_dir': settings.BASE_DIR / 'foo'})
+        errors = check_manifest(None)
+        APP_SETTINGS.update({'output_dir': None})
+        self.assertEqual(errors[0].id, 'manifest_loader.E002')
+
+    def test_system_check_loader(self):
+        APP_SETTINGS.update({'loader': object})
+        errors = check_manifest(None)
+        APP_SETTINGS.update({'loader': DefaultLoader})
+        self.assertEqual(errors[0].id, 'manifest_loader.E001')
+
+
+class NamespaceTests(SimpleTestCase):
+    def setUp(self):
+        APP_SETTINGS.update({'manifests': {
+            'checkout': {'manifest_file': 'url_manifest.json', 'cache': True},
+            'admin': {'output_dir': settings.BASE_DIR / 'foo'},
+        }})
+
+    def tearDown(self):
+        APP_SETTINGS.update({'manifests': {}})
+        cache.clear()
+
+    def test_namespaced_key(self):
+        rendered = render_template(
+            '{% load manifest %}'
+            '{% manifest "checkout:main.js" %} {% manifest "main.js" %}'
+        )
+        self.assertEqual(
+            rendered,
+            'http://localhost:8080/main.js '
+            '/static/main.e12dfe2f9b185dea03a4.js'
+        )
+
+    def test_namespaced_match(self):
+        self.assertEqual(
+            manifest_match('checkout:*.css', '{match}'),
+            'http://localhost:8080/styles.hash.css'
+        )
+
+    def test_namespace_has_own_cache(self):
+        manifest('checkout:main.js')
+        self.assertEqual(cache.get('webpack_manifest:checkout')['main.js'],
+                         'http://localhost:8080/main.js')
+        self.assertIsNone(cache.get('webpack_manifest'))
+
+    def test_unused_namespace_not_loaded(self):
+        # the admin manifest doesn't exist, so loading it would raise
+        manifest('checkout:main.js')
+        with self.assertRaises(WebpackManifestNotFound):
+            manifest('admin:main.js')
+
+    def test_unknown_prefix_is_part_of_key(self):
+        with self.assertLogs('manifest_loader', 'WARNING'):
+            self.assertEqual(manifest('other:main.js'),
+                             '/static/other%3Amain.js')
+
+
+def host_resolver(context, namespace):
+    request = context.get('request') if context is not None else None
+    if request is not None and \
+            request.META['HTTP_HOST'] == 'cdn.example.com':
+        return {'manifest_file': 'url_manifest.json'}
+    return None
+
+
+class ResolverTests(SimpleTestCase):
+    def setUp(self):
+        APP_SETTINGS.update({'resolver': host_resolver})
+        _manifest_cache.clear()
+
+    def tearDown(self):
+        APP_SETTINGS.update({'resolver': None})
+        _manifest_cache.clear()
+
+    def render_for_host(self, host):
+        request = RequestFactory().get('/', HTTP_HOST=host)
+        return render_template(
+            '{% load manifest %}{% manifest "main.js" %}',
+            {'request': request}
+        )
+
+    def test_manifest_chosen_per_request(self):
+        self.assertEqual(self.render_for_host('cdn.example.com'),
+                         'http://localhost:8080/main.js')
+        self.assertEqual(self.render_for_host('example.com'),
+                         '/static/main.e12dfe2f9b185dea03a4.js')
+
+    def test_parsed_manifests_are_reused(self):
+        with mock.patch('manifest_loader.utils.json.loads',
+                        wraps=json.loads) as loads:
+            for _ in range(3):
+                self.render_for_host('cdn.example.com')
+                self.render_for_host('example.com')
+        self.assertEqual(loads.call_count, 2)
+
+    def test_parsed_manifests_are_bounded(self):
+        _manifest_cache.maxsize, maxsize = 1, _manifest_cache.maxsize
+        with mock.patch('manifest_loader.utils.json.loads',
+                        wraps=json.loads) as loads:
+            for _ in range(2):
+                self.render_for_host('cdn.example.com')
+                self.render_for_host('example.com')
+        _manifest_cache.maxsize = maxsize
+        self.assertEqual(loads.call_count, 4)
+
+    def test_changed_file_is_parsed_again(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            path = os.path.join(output_dir, 'manifest.json')
+            APP_SETTINGS.update({'output_dir': output_dir})
+            with open(path, 'w') as manifest_file:
+                json.dump({'main.js': 'main.old.js'}, manifest_file)
+            self.assertEqual(manifest('main.js'), '/static/main.old.js')
+            with open(path, 'w') as manifest_file:
+                json.dump({'main.js': 'main.newer.js'}, manifest_file)
+            self.assertEqual(manifest('main.js'), '/static/main.newer.js')
+            APP_SETTINGS.update({'output_dir': None})
+
+
+class DifferentialTests(SimpleTestCase):
+    modern = ('Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) '
+              'AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 '
+              'Safari/605.1.15')
+    legacy = 'Mozilla/5.0 (Windows NT 6.1; Trident/7.0; rv:11.0) like Gecko'
+
+    def setUp(self):
+        self.output_dir = tempfile.TemporaryDirectory()
+        with open(os.path.join(self.output_dir.name, 'manifest.json'),
+                  'w') as manifest_file:
+            json.dump({'main.js': 'main.legacy.js'}, manifest_file)
+        APP_SETTINGS.update({
+            'resolver': differential_resolver,
+            'legacy_overrides': {'output_dir': self.output_dir.name},
+        })
+
+    def tearDown(self):
+        APP_SETTINGS.update({'resolver': None, 'legacy_overrides': None})
+        self.output_dir.cleanup()
+
+    def test_classify_user_agent(self):
+        user_agents = {
+            self.modern: False,
+            self.legacy: True,
+            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+            '(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36': False,
+            'Mozilla/5.0 (Windows NT 10.0) AppleWebKit/537.36 (KHTML, like '
+            'Gecko) Chrome/49.0.2623.112 Safari/537.36': True,
+            'Mozilla/5.0 (Windows NT 10.0) AppleWebKit/537.36 (KHTML, like '
+            'Gecko) Chrome/70.0 Safari/537.36 Edge/15.15063': True,
+            'Mozilla/5.0 (X11; Linux x86_64; rv:52.0) Gecko/20100101 '
+            'Firefox/52.0': True,
+            'Mozilla/5.0 (iPhone; CPU iPhone OS 10_3 like Mac OS X) '
+            'AppleWebKit/603.1.30 (KHTML, like Gecko) Version/10.0 '
+            'Mobile/14E277 Safari/602.1': True,
+            'Mozilla/5.0 (Linux; U; Android 4.0.3) AppleWebKit/534.30 '
+            '(KHTML, like Gecko) Version/4.0 Mobile Safari/534.30': True,
+            'curl/8.0': False,
+            '': False,
+        }
+        for user_agent, legacy in user_agents.items():
+            with self.subTest(user_agent=user_agent):
+                self.assertIs(classify_user_agent(user_agent), legacy)
+
+    def test_classification_memoized(self):
+        _ua_cache.clear()
+        with mock.patch('manifest_loader.differential._classify',
+                        return_value=True) as classify:
+            for _ in range(3):
+                classify_user_agent(self.legacy)
+        self.assertEqual(classify.call_count, 1)
+
+    def test_client_hints(self):
+        request = RequestFactory().get('/', HTTP_USER_AGENT=self.legacy,
+                                       HTTP_SEC_CH_UA='"Chromium";v="120"')
+        self.assertFalse(is_legacy_client(request))
+
+    def test_manifest_chosen_per_client(self):
+        def view(request):
+            return HttpResponse(render_template(
+                '{% load manifest %}{% manifest "main.js" %}',
+                {'request': request}))
+
+        for user_agent, url in ((self.legacy, b'/static/main.legacy.js'),
+                                (self.modern,
+                                 b'/static/main.e12dfe2f9b185dea03a4.js')):
+            request = RequestFactory().get('/', HTTP_USER_AGENT=user_agent)
+            response = differential_middleware(view)(request)
+            self.assertEqual(response.content, url)
+            self.assertEqual(response['Vary'], 'User-Agent, Sec-CH-UA')
+
+
+class SnapshotTests(SimpleTestCase):
+    def test_one_load_per_render(self):
+        with mock.patch('manifest_loader.utils._read_manifest',
+                        wraps=_read_manifest) as read_manifest:
+            render_template(
+                '{% load manifest %}'
+                '{% manifest "main.js" %}{% manifest "chunk1.js" %}'
+                '{% manifest_match "*.css" "{match}" %}'
+            )
+        self.assertEqual(read_manifest.call_count, 1)
+
+    def test_middleware_pins_manifest(self):
+        def view(request):
+            first = manifest('main.js')
+            write_manifest({'main.js': 'main.newer.js'})
+            return HttpResponse(first + ' ' + manifest('main.js'))
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            path = os.path.join(output_dir, 'manifest.json')
+
+            def write_manifest(data):
+                with open(path, 'w') as manifest_file:
+                    json.dump(data, manifest_file)
+
+            write_manifest({'main.js': 'main.old.js'})
+            APP_SETTINGS.update({'output_dir': output_dir})
+            response = snapshot_middleware(view)(RequestFactory().get('/'))
+            after = manifest('main.js')
+            APP_SETTINGS.update({'output_dir': None})
+
+        self.assertEqual(response.content,
+                         b'/static/main.old.js /static/main.old.js')
+        self.assertEqual(after, '/static/main.newer.js')
+
+    def test_async_middleware(self):
+        async def view(request):
+            return HttpResponse(manifest('main.js'))
+
+        response = async_to_sync(snapshot_middleware(view))(
+            RequestFactory().get('/'))
+        self.assertEqual(response.content,
+                         b'/static/main.e12dfe2f9b185dea03a4.js')
+
+
+class VersionTokenTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_manifest_version(self):
+        version = manifest_version()
+        self.assertEqual(len(version), 16)
+        self.assertEqual(manifest_key_prefix('site'), 'site.' + version)
+        self.assertEqual(manifest_key_prefix(), version)
+
+    def test_cache_page_follows_manifest(self):
+        calls = []
+
+        @manifest_cache_page(60)
+        def view(request):
+            calls.append(request)
+            return HttpResponse('ok')
+
+        request = RequestFactory().get('/page/')
+        view(request)
+        view(request)
+        self.assertEqual(len(calls), 1)
+        with mock.patch('manifest_loader.decorators.manifest_key_prefix',
+                        return_value='other'):
+            view(request)
+        self.assertEqual(len(calls), 2)
+
+    def test_etag_middleware(self):
+        def view(request):
+            response = HttpResponse(manifest('main.js'))
+            response['ETag'] = '"abc"'
+            response['Last-Modified'] = 'Mon, 01 Jan 2024 00:00:00 GMT'
+            return response
+
+        response = etag_middleware(view)(RequestFactory().get('/'))
+        etag = '"abc-{}"'.format(manifest_version())
+        self.assertEqual(response['ETag'], etag)
+        self.assertFalse(response.has_header('Last-Modified'))
+
+        response = etag_middleware(view)(
+            RequestFactory().get('/', HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_middleware_sets_missing_etag(self):
+        def view(request):
+            return HttpResponse(manifest('main.js'))
+
+        handler = ConditionalGetMiddleware(etag_middleware(view))
+        response = handler(RequestFactory().get('/'))
+        etag = response['ETag']
+        self.assertTrue(etag.endswith('-{}"'.format(manifest_version())))
+
+        response = handler(RequestFactory().get('/', HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_middleware_without_manifest(self):
+        def view(request):
+            response = HttpResponse('plain')
+            response['ETag'] = 'W/"abc"'
+            return response
+
+        response = etag_middleware(view)(RequestFactory().get('/'))
+        self.assertEqual(response['ETag'], 'W/"abc"')
+
+    def test_async_etag_middleware(self):
+        async def view(request):
+            response = HttpResponse(manifest('main.js'))
+            response['ETag'] = 'W/"abc"'
+            return response
+
+        response = async_to_sync(etag_middleware(view))(
+            RequestFactory().get('/'))
+        self.assertEqual(response['ETag'],
+                         'W/"abc-{}"'.format(manifest_version()))
+
+
+class AsyncTests(SimpleTestCase):
+    def test_async_variants(self):
+        async def render():
+            return (await manifest_async('main.js'),
+                    await manifest_match_async('chunk*.js', '{match}'))
+
+        url, matches = asyncio.run(render())
+        self.assertEqual(url, '/static/main.e12dfe2f9b185dea03a4.js')
+        self.assertEqual(matches, manifest_match('chunk*.js', '{match}'))
+
+    def test_loaded_off_the_loop_once(self):
+        threads = []
+        fetch_manifest = utils._fetch_manifest
+
+        def fetch(config, cache_key):
+            threads.append(threading.current_thread())
+            time.sleep(0.05)
+            return fetch_manifest(config, cache_key)
+
+        async def render():
+            return await asyncio.gather(
+                *[manifest_async('main.js') for _ in range(10)])
+
+        with mock.patch('manifest_loader.utils._fetch_manifest',
+                        side_effect=fetch):
+            urls = asyncio.run(render())
+        self.assertEqual(set(urls), {'/static/main.e12dfe2f9b185dea03a4.js'})
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.current_thread())
+        self.assertEqual(utils._loading, {})
+
+    def test_snapshot_shared(self):
+        async def render():
+            with manifest_snapshot() as pinned:
+                await manifest_async('main.js')
+                with mock.patch('manifest_loader.utils._fetch_manifest',
+                                side_effect=AssertionError):
+                    await manifest_async('chunk1.js')
+                    manifest('chunk2.js')
+                return pinned
+
+        self.assertEqual(list(asyncio.run(render())), ['webpack_manifest'])
+
+    def test_cancelled_waiter_does_not_cancel_others(self):
+        release = threading.Event()
+        fetch_manifest = utils._fetch_manifest
+
+        def fetch(config, cache_key):
+            release.wait(5)
+            return fetch_manifest(config, cache_key)
+
+        async def render():
+            first = asyncio.ensure_future(manifest_async('main.js'))
+            second = asyncio.ensure_future(manifest_async('main.js'))
+            await asyncio.sleep(0.01)
+            first.cancel()
+            await asyncio.sleep(0.01)
+            release.set()
+            with self.assertRaises(asyncio.CancelledError):
+                await first
+            return await second
+
+        with mock.patch('manifest_loader.utils._fetch_manifest',
+                        side_effect=fetch):
+            url = asyncio.run(render())
+        self.assertEqual(url, '/static/main.e12dfe2f9b185dea03a4.js')
+        self.assertEqual(utils._loading, {})
+
+    def test_lookup_table_read_off_the_loop(self):
+        threads = []
+        read_manifest = utils._read_manifest
+
+        def read(path):
+            threads.append(threading.current_thread())
+            return read_manifest(path)
+
+        async def render():
+            return (await manifest_async('main.js'),
+                    await manifest_match_async('chunk*.js', '{match}'))
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            path = os.path.join(output_dir, 'lookup.json')
+            call_command('manifest_scan', '-o', path, stdout=io.StringIO())
+            APP_SETTINGS.update({'lookup_table': path})
+            try:
+                with mock.patch('manifest_loader.utils._read_manifest',
+                                side_effect=read):
+                    url, matches = asyncio.run(render())
+            finally:
+                APP_SETTINGS.update({'lookup_table': None})
+        self.assertEqual(url, '/static/main.e12dfe2f9b185dea03a4.js')
+        self.assertEqual(matches.splitlines()[0], '/static/chunk1.hash.js')
+        self.assertTrue(threads)
+        self.assertNotIn(threading.current_thread(), threads)
+
+
+class ImportmapTests(SimpleTestCase):
+    def setUp(self):
+        _derived_cache.clear()
+
+    def test_renders_importmap(self):
+        rendered = render_template(
+            '{% load manifest %}{% manifest_importmap %}'
+        )
+        self.assertEqual(
+            rendered,
+            '<script type="importmap">{"imports":{'
+            '"main":"/static/main.e12dfe2f9b185dea03a4.js",'
+            '"chunk1":"/static/chunk1.hash.js",'
+            '"chunk2":"/static/chunk2.hash.js",'
+            '"chunk3":"/static/chunk3.hash.js"}}</script>'
+        )
+
+    def test_hash_matches_script(self):
+        script = manifest_importmap()
+        body = script[len('<script type="importmap">'):-len('</script>')]
+        digest = base64.b64encode(hashlib.sha256(body.encode()).digest())
+        self.assertEqual(
+            render_template('{% load manifest %}'
+                            '{% manifest_importmap_hash %}'),
+            "'sha256-{}'".format(digest.decode())
+        )
+
+    def test_built_once_per_version(self):
+        with mock.patch('manifest_loader.utils._importmap_json',
+                        wraps=_importmap_json) as importmap_json:
+            manifest_importmap()
+            manifest_importmap()
+        self.assertEqual(importmap_json.call_count, 1)
+
+    def test_view(self):
+        response = importmap_json(RequestFactory().get('/'))
+        self.assertEqual(response['Content-Type'],
+                         'application/importmap+json')
+        self.assertEqual(
+            json.loads(response.content)['imports']['main'],
+            '/static/main.e12dfe2f9b185dea03a4.js'
+        )
+        self.assertTrue(response.has_header('ETag'))
+
+
+class ManifestJsonViewTests(SimpleTestCase):
+    def setUp(self):
+        _derived_cache.clear()
+
+    def test_whole_manifest(self):
+        response = manifest_json(RequestFactory().get('/'))
+        self.assertEqual(json.loads(response.content), {
+            'main.js': '/static/main.e12dfe2f9b185dea03a4.js',
+            'chunk1.js': '/static/chunk1.hash.js',
+            'chunk2.js': '/static/chunk2.hash.js',
+            'chunk3.js': '/static/chunk3.hash.js',
+            'styles.css': '/static/styles.hash.css',
+        })
+
+    def test_subset(self):
+        APP_SETTINGS.update({'json_patterns': ['*.css']})
+        response = manifest_json(RequestFactory().get('/'))
+        APP_SETTINGS.update({'json_patterns': None})
+        self.assertEqual(json.loads(response.content),
+                         {'styles.css': '/static/styles.hash.css'})
+
+    def test_not_modified(self):
+        etag = manifest_json(RequestFactory().get('/'))['ETag']
+        response = manifest_json(
+            RequestFactory().get('/', HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_gzip(self):
+        response = manifest_json(
+            RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip, deflate'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertIn('-gzip', response['ETag'])
+        self.assertEqual(
+            json.loads(gzip.decompress(response.content))['main.js'],
+            '/static/main.e12dfe2f9b185dea03a4.js'
+        )
+
+    def test_brotli(self):
+        brotli = mock.Mock()
+        brotli.compress.side_effect = lambda body: b'br:' + body
+        with mock.patch('manifest_loader.views.brotli', brotli):
+            response = manifest_json(
+                RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip, br'))
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertIn('-br', response['ETag'])
+        self.assertTrue(response.content.startswith(b'br:'))
+        self.assertEqual(
+            json.loads(response.content[3:])['main.js'],
+            '/static/main.e12dfe2f9b185dea03a4.js'
+        )
+
+    def test_brotli_not_accepted(self):
+        brotli = mock.Mock()
+        brotli.compress.side_effect = lambda body: b'br:' + body
+        with mock.patch('manifest_loader.views.brotli', brotli):
+            response = manifest_json(
+                RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_unknown_namespace(self):
+        for view in (manifest_json, importmap_json):
+            with self.assertRaises(Http404):
+                view(RequestFactory().get('/'), 'nope')
+
+    def test_serialised_once_per_version(self):
+        with mock.patch('manifest_loader.views._Payload',
+                        wraps=_Payload) as payload:
+            manifest_json(RequestFactory().get('/'))
+            manifest_json(RequestFactory().get('/'))
+        self.assertEqual(payload.call_count, 1)
+
+
+class PrecacheTests(SimpleTestCase):
+    def setUp(self):
+        _derived_cache.clear()
+
+    def test_precache_list(self):
+        entries = manifest_precache(include=['*.js'], exclude=['chunk*'])
+        self.assertEqual(
+            [entry['url'] for entry in entries],
+            ['/static/main.e12dfe2f9b185dea03a4.js']
+        )
+        self.assertIsNone(entries[0]['revision'])
+
+    def test_revision_of_unhashed_files(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            with open(os.path.join(output_dir, 'manifest.json'),
+                      'w') as manifest_file:
+                json.dump({'main.js': 'main.e12dfe2f9b185dea03a4.js',
+                           'sw.js': 'sw.js', 'gone.js': 'gone.js'},
+                          manifest_file)
+            APP_SETTINGS.update({'output_dir': output_dir})
+            try:
+                with mock.patch('manifest_loader.utils._read_static',
+                                side_effect=lambda path: {
+                                    'sw.js': b'self.skipWaiting()'}.get(path)):
+                    entries = {entry['url']: entry['revision']
+                               for entry in manifest_precache()}
+            finally:
+                APP_SETTINGS.update({'output_dir': None})
+        self.assertIsNone(entries['/static/main.e12dfe2f9b185dea03a4.js'])
+        self.assertEqual(entries['/static/sw.js'],
+                         hashlib.blake2b(b'self.skipWaiting()',
+                                         digest_size=8).hexdigest())
+        self.assertEqual(len(entries['/static/gone.js']), 16)
+
+    def test_default_patterns(self):
+        self.assertEqual(len(manifest_precache()), 5)
+
+    def test_view_streams_list(self):
+        response = precache_json(RequestFactory().get('/'))
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content)
+        self.assertEqual(json.loads(content), manifest_precache())
+
+        response = precache_json(
+            RequestFactory().get('/', HTTP_IF_NONE_MATCH=response['ETag']))
+        self.assertEqual(response.status_code, 304)
+
+    def test_view_unknown_namespace(self):
+        with self.assertRaises(Http404):
+            precache_json(RequestFactory().get('/'), 'nope')
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('manifest_precache', '--include', '*.css', stdout=out)
+        self.assertEqual(
+            json.loads(out.getvalue()),
+            [{'url': '/static/styles.hash.css',
+              'revision': manifest_precache()[-1]['revision']}]
+        )
+
+
+class InlineTests(SimpleTestCase):
+    def setUp(self):
+        _inline_cache.clear()
+
+    def tearDown(self):
+        _inline_cache.clear()
+
+    def test_inlines_css(self):
+        rendered = render_template(
+            '{% load manifest %}{% manifest_inline "styles.css" %}'
+            ' {% manifest_inline_hash "styles.css" %}'
+        )
+        digest = base64.b64encode(
+            hashlib.sha256(b'body{color:red}\n').digest()).decode()
+        self.assertEqual(
+            rendered,
+            "<style>body{color:red}\n</style> 'sha256-%s'" % digest
+        )
+
+    def test_large_file_is_linked(self):
+        APP_SETTINGS.update({'inline_max_size': 100})
+        rendered = render_template(
+            '{% load manifest %}{% manifest_inline "main.js" %}'
+            '{% manifest_inline_hash "main.js" %}'
+        )
+        APP_SETTINGS.update({'inline_max_size': 16 * 1024})
+        self.assertEqual(
+            rendered,
+            '<script src="/static/main.e12dfe2f9b185dea03a4.js"></script>'
+        )
+
+    def test_file_read_once(self):
+        with mock.patch('manifest_loader.utils._read_static',
+                        wraps=_read_static) as read_static:
+            manifest_inline('main.js')
+            manifest_inline('main.js')
+        self.assertEqual(read_static.call_count, 1)
+        self.assertEqual(_inline_cache.nbytes,
+                         len(manifest_inline('main.js')))
+
+    def test_cache_is_bounded_by_size(self):
+        _inline_cache.maxbytes, maxbytes = 100, _inline_cache.maxbytes
+        manifest_inline('styles.css')
+        manifest_inline('main.js')
+        _inline_cache.maxbytes = maxbytes
+        self.assertEqual(len(_inline_cache), 0)
+
+    def test_other_types_are_linked(self):
+        with mock.patch('manifest_loader.utils._read_static',
+                        return_value=b'\x89PNG\r\n\x1a\n') as read_static:
+            self.assertEqual(
+                manifest_inline('logo.png'),
+                '<link rel="preload" href="/static/logo.png" as="image">')
+        read_static.assert_not_called()
+        self.assertEqual(manifest_inline_hash('logo.png'), '')
+
+    def test_binary_content_is_linked(self):
+        with mock.patch('manifest_loader.utils._read_static',
+                        return_value=b'\xff\xfe\x00'):
+            self.assertEqual(manifest_inline('vendor.js'),
+                             '<script src="/static/vendor.js"></script>')
+
+    def test_closing_tag_is_linked(self):
+        contents = {
+            'main.js': b'document.write("</SCRIPT>")',
+            'styles.css': b'a::after{content:"</style>"}',
+            'chunk1.js': b'var comment = "<!--";',
+        }
+        with mock.patch('manifest_loader.utils._read_static',
+                        side_effect=lambda path: contents[
+                            'styles.css' if path.endswith('.css')
+                            else path.split('.')[0] + '.js']):
+            self.assertEqual(
+                manifest_inline('main.js'),
+                '<script src="/static/main.e12dfe2f9b185dea03a4.js">'
+                '</script>')
+            self.assertEqual(
+                manifest_inline('styles.css'),
+                '<link rel="stylesheet" href="/static/styles.hash.css">')
+            self.assertEqual(
+                manifest_inline('chunk1.js'),
+                '<script src="/static/chunk1.hash.js"></script>')
+        self.assertEqual(manifest_inline_hash('main.js'), '')
+
+
+class StorageTests(SimpleTestCase):
+    def setUp(self):
+        self.remote_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.storage = FileSystemStorage(location=self.remote_dir.name)
+        self.write_manifest({'main.js': 'main.remote.js'})
+        APP_SETTINGS.update({
+            'storage': self.storage,
+            'storage_cache_dir': self.cache_dir.name,
+            'storage_refresh_interval': 0,
+        })
+
+    def tearDown(self):
+        APP_SETTINGS.update({'storage': None, 'storage_cache_dir': None,
+                             'storage_refresh_interval': 60})
+        self.remote_dir.cleanup()
+        self.cache_dir.cleanup()
+
+    def write_manifest(self, data):
+        path = os.path.join(self.remote_dir.name, 'manifest.json')
+        with open(path, 'w') as manifest_file:
+            json.dump(data, manifest_file)
+
+    def get_sync(self):
+        return get_local_copy(self.storage, 'manifest.json',
+                              self.cache_dir.name, 0), \
+            [sync for sync in _syncs.values() if sync.storage is self.storage]
+
+    def test_reads_through_storage(self):
+        self.assertEqual(manifest('main.js'), '/static/main.remote.js')
+        path, syncs = self.get_sync()
+        self.assertTrue(path.startswith(self.cache_dir.name))
+        self.assertTrue(os.path.isfile(path))
+
+    def test_refresh_is_conditional(self):
+        manifest('main.js')
+        sync = self.get_sync()[1][0]
+        with mock.patch.object(self.storage, 'open',
+                               wraps=self.storage.open) as storage_open:
+            self.assertFalse(sync.refresh())
+        storage_open.assert_not_called()
+
+        self.write_manifest({'main.js': 'main.updated.js'})
+        os.utime(os.path.join(self.remote_dir.name, 'manifest.json'),
+                 (0, time.time() + 10))
+        self.assertTrue(sync.refresh())
+        self.assertEqual(manifest('main.js'), '/static/main.updated.js')
+
+    def test_render_does_not_hit_storage(self):
+        manifest('main.js')
+        with mock.patch.object(self.storage, 'open') as storage_open, \
+                mock.patch.object(self.storage,
+                                  'get_modified_time') as modified_time:
+            manifest('main.js')
+        storage_open.assert_not_called()
+        modified_time.assert_not_called()
+
+    def forget_syncs(self):
+        """drops the syncs, as if the process had restarted"""
+        for key, sync in list(_syncs.items()):
+            if sync.storage is self.storage:
+                del _syncs[key]
+
+    def test_copy_from_previous_process_is_refreshed(self):
+        manifest('main.js')
+        self.forget_syncs()
+        self.write_manifest({'main.js': 'main.deployed.js'})
+        with mock.patch.object(StorageSync, '_run') as run:
+            # served without waiting on the storage
+            self.assertEqual(manifest('main.js'), '/static/main.remote.js')
+        sync = self.get_sync()[1][0]
+        run.assert_called_once_with(True)
+        sync._run(True)
+        self.assertEqual(manifest('main.js'), '/static/main.deployed.js')
+
+    def test_copy_kept_when_storage_fails(self):
+        manifest('main.js')
+        self.forget_syncs()
+        with mock.patch.object(self.storage, 'open', side_effect=OSError), \
+                self.assertLogs('manifest_loader', 'ERROR'):
+            self.assertEqual(manifest('main.js'), '/static/main.remote.js')
+            self.get_sync()[1][0]._thread.join(5)
+        self.assertEqual(manifest('main.js'), '/static/main.remote.js')
+
+    def test_synced_at_startup(self):
+        self.forget_syncs()
+        with mock.patch.object(self.storage, 'open',
+                               wraps=self.storage.open) as storage_open:
+            sync_local_copies([APP_SETTINGS])
+            self.assertEqual(storage_open.call_count, 1)
+            manifest('main.js')
+        self.assertEqual(storage_open.call_count, 1)
+
+    def test_missing_remote_file(self):
+        os.remove(os.path.join(self.remote_dir.name, 'manifest.json'))
+        with self.assertRaises(WebpackManifestNotFound):
+            manifest('main.js')
+
+
+class StubDevServerHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    body = b'{"main.js": "http://localhost:8080/main.js"}'
+
+    def do_GET(self):
+        self.server.requests.append(dict(self.headers))
+        if self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('ETag', '"v1"')
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+class DevServerTests(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0),
+                                          StubDevServerHandler)
+        self.server.requests = []
+        threading.Thread(target=self.server.serve_forever,
+                         daemon=True).start()
+        self.url = 'http://127.0.0.1:{}/manifest.json'.format(
+            self.server.server_port)
+        APP_SETTINGS.update({'dev_server_url': self.url})
+
+    def tearDown(self):
+        APP_SETTINGS.update({'dev_server_url': None})
+        for dev_server in _dev_servers.values():
+            dev_server.close()
+        _dev_servers.clear()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_fetches_manifest(self):
+        rendered = render_template(
+            '{% load manifest %}' + '{% manifest "main.js" %}' * 40
+        )
+        self.assertEqual(rendered, 'http://localhost:8080/main.js' * 40)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_rate_limited(self):
+        for _ in range(5):
+            manifest('main.js')
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_conditional_refresh(self):
+        APP_SETTINGS.update({'dev_server_refresh_interval': 0})
+        manifest('main.js')
+        dev_server = _dev_servers[self.url]
+        connection = dev_server._connection
+        data = dev_server.data
+        manifest('main.js')
+        APP_SETTINGS.update({'dev_server_refresh_interval': 1.0})
+        self.assertEqual(self.server.requests[1]['If-None-Match'], '"v1"')
+        self.assertIs(dev_server.data, data)
+        self.assertIs(dev_server._connection, connection)
+
+    def test_server_down(self):
+        APP_SETTINGS.update({'dev_server_url': 'http://127.0.0.1:1/'})
+        with self.assertRaises(WebpackManifestNotFound):
+            manifest('main.js')
+
+    def test_keeps_last_manifest_when_server_goes_down(self):
+        APP_SETTINGS.update({'dev_server_refresh_interval': 0})
+        manifest('main.js')
+        self.server.shutdown()
+        self.server.server_close()
+        _dev_servers[self.url].close()
+        with self.assertLogs('manifest_loader', 'WARNING'):
+            self.assertEqual(manifest('main.js'),
+                             'http://localhost:8080/main.js')
+        APP_SETTINGS.update({'dev_server_refresh_interval': 1.0})
+
+
+class ScanTests(SimpleTestCase):
+    def test_finds_usages(self):
+        keys, patterns = find_manifest_usages()
+        self.assertEqual(keys, {'styles.css', 'main.js'})
+        self.assertEqual(patterns, {'*.js', 'chunk*.js'})
+
+    def test_missing_key(self):
+        with mock.patch('manifest_loader.management.commands.manifest_scan.'
+                        'find_manifest_usages',
+                        return_value=({'main.js', 'typo.js'}, set())):
+            with self.assertRaisesMessage(CommandError, 'typo.js'):
+                call_command('manifest_scan', '--check', stdout=io.StringIO())
+
+    def test_lookup_table_used_instead_of_manifest(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            path = os.path.join(output_dir, 'lookup.json')
+            call_command('manifest_scan', '-o', path, stdout=io.StringIO())
+            with open(path) as table_file:
+                table = json.load(table_file)
+            self.assertEqual(table['keys']['main.js'],
+                             '/static/main.e12dfe2f9b185dea03a4.js')
+            self.assertEqual(len(table['patterns']['*.js']), 4)
+
+            APP_SETTINGS.update({'lookup_table': path})
+            with mock.patch('manifest_loader.utils._load_manifest') as load:
+                rendered = render_template(
+                    '{% load manifest %}{% manifest "main.js" %}'
+                    '{% manifest_match "chunk*.js" "{match}," %}'
+                )
+            load.assert_not_called()
+            self.assertEqual(
+                manifest('chunk1.js'), '/static/chunk1.hash.js')
+            APP_SETTINGS.update({'lookup_table': None})
+
+        self.assertEqual(
+            rendered,
+            '/static/main.e12dfe2f9b185dea03a4.js/static/chunk1.hash.js,\n'
+            '/static/chunk2.hash.js,\n/static/chunk3.hash.js,'
+        )
+
+
+class MultiPatternTests(SimpleTestCase):
+    def test_include_and_exclude(self):
+        rendered = render_template(
+            '{% load manifest %}'
+            '{% manifest_match "*.js" "!chunk*" "*.css" "{match}" %}'
+        )
+        self.assertEqual(
+            rendered,
+            '/static/main.e12dfe2f9b185dea03a4.js\n/static/styles.hash.css'
+        )
+
+    def test_regex(self):
+        self.assertEqual(
+            manifest_match(['re:^chunk[12]', '!re:2'], '{match}'),
+            '/static/chunk1.hash.js'
+        )
+
+    def test_deduplicated_in_manifest_order(self):
+        self.assertEqual(
+            DefaultLoader.get_multi_match(
+                {'b.js': 'shared.js', 'a.js': 'shared.js', 'c.js': 'c.js'},
+                ['c.*', '*.js']),
+            ['shared.js', 'c.js']
+        )
+
+    def test_single_compiled_matcher(self):
+        matches = compile_patterns(['*.css', '!*print*', 're:rtl$'])
+        self.assertTrue(matches('main.css'))
+        self.assertTrue(matches('main.rtl'))
+        self.assertFalse(matches('main.print.css'))
+        self.assertIs(matches, compile_patterns(['*.css', '!*print*',
+                                                 're:rtl$']))
+
+    def test_matches_computed_once_per_version(self):
+        _derived_cache.clear()
+        with mock.patch.object(DefaultLoader, 'get_multi_match',
+                               wraps=DefaultLoader.get_multi_match) as match:
+            manifest_match(['*.js', '!main*'], '{match}')
+            manifest_match(['*.js', '!main*'], '{match}')
+        self.assertEqual(match.call_count, 1)
+
+
+class ManifestAssetsTests(SimpleTestCase):
+    def test_context_processor(self):
+        engine = Engine(context_processors=[
+            'manifest_loader.context_processors.assets'])
+        rendered = engine.from_string(
+            '{{ assets.main_js }} {{ assets.styles_css }}'
+        ).render(RequestContext(RequestFactory().get('/')))
+        self.assertEqual(
+            rendered,
+            '/static/main.e12dfe2f9b185dea03a4.js /static/styles.hash.css'
+        )
+
+    def test_item_lookup(self):
+        mapping = ManifestAssets()
+        self.assertEqual(mapping['chunk1.js'], '/static/chunk1.hash.js')
+        self.assertIn('main.js', mapping)
+        self.assertNotIn('foo.js', mapping)
+        self.assertIsNone(mapping.get('foo.js'))
+        with self.assertRaises(AttributeError):
+            mapping.foo_js
+
+    def test_lazy_and_memoized(self):
+        with mock.patch('manifest_loader.utils._load_manifest',
+                        wraps=_load_manifest) as load:
+            mapping = ManifestAssets()
+            load.assert_not_called()
+            for _ in range(3):
+                mapping['main.js']
+                mapping['chunk1.js']
+        self.assertEqual(load.call_count, 1)
+
+
+class SrcsetTests(SimpleTestCase):
+    def setUp(self):
+        self.output_dir = tempfile.TemporaryDirectory()
+        with open(os.path.join(self.output_dir.name, 'manifest.json'),
+                  'w') as manifest_file:
+            json.dump({
+                'hero.jpg': 'hero.1.jpg',
+                'hero@2x.jpg': 'hero@2x.1.jpg',
+                'hero.webp': 'hero.1.webp',
+                'hero-1280w.webp': 'hero-1280w.1.webp',
+                'hero-640w.webp': 'hero-640w.1.webp',
+                'main.js': 'main.1.js',
+                'hero.js': 'hero.1.js',
+                'hero.css': 'hero.1.css',
+            }, manifest_file)
+        APP_SETTINGS.update({'output_dir': self.output_dir.name})
+
+    def tearDown(self):
+        APP_SETTINGS.update({'output_dir': None, 'strict': False})
+        self.output_dir.cleanup()
+
+    def test_other_files_are_not_formats(self):
+        picture = manifest_picture('hero.jpg')
+        self.assertNotIn('hero.1.js', picture)
+        self.assertNotIn('hero.1.css', picture)
+        self.assertEqual(picture.count('<source'), 1)
+
+    def test_srcset_tag(self):
+        rendered = render_template(
+            '{% load manifest %}<img {% manifest_srcset "hero.jpg" %}>'
+        )
+        self.assertEqual(
+            rendered,
+            '<img srcset="/static/hero.1.jpg 1x, /static/hero%402x.1.jpg 2x">'
+        )
+
+    def test_widths_sorted(self):
+        rendered = render_template(
+            '{% load manifest %}{% manifest_srcset "hero.webp" "50vw" %}'
+        )
+        self.assertEqual(
+            rendered,
+            'srcset="/static/hero-640w.1.webp 640w, '
+            '/static/hero-1280w.1.webp 1280w" sizes="50vw"'
+        )
+
+    def test_picture_tag(self):
+        rendered = render_template(
+            '{% load manifest %}{% manifest_picture "hero.jpg" "50vw" alt %}',
+            {'alt': 'A <hero>'}
+        )
+        self.assertEqual(
+            rendered,
+            '<picture><source type="image/webp" srcset="/static/'
+            'hero-640w.1.webp 640w, /static/hero-1280w.1.webp 1280w" '
+            'sizes="50vw"><img src="/static/hero.1.jpg" srcset="/static/'
+            'hero.1.jpg 1x, /static/hero%402x.1.jpg 2x" sizes="50vw" '
+            'alt="A &lt;hero&gt;"></picture>'
+        )
+
+    def test_index_built_once(self):
+        with mock.patch('manifest_loader.utils._build_variants',
+                        wraps=utils._build_variants) as build:
+            render_template(
+                '{% load manifest %}{% manifest_srcset "hero.jpg" %}'
+                '{% manifest_srcset "hero.webp" %}'
+                '{% manifest_picture "hero.jpg" %}'
+            )
+        self.assertEqual(build.call_count, 1)
+
+    def test_missing_image(self):
+        self.assertEqual(render_template(
+            '{% load manifest %}{% manifest_srcset "logo.png" %}'
+        ), 'srcset="/static/logo.png"')
+        APP_SETTINGS.update({'strict': True})
+        with self.assertRaises(ManifestKeyNotFound):
+            render_template(
+                '{% load manifest %}{% manifest_srcset "logo.png" %}')
+
+    def test_tag_arguments(self):
+        with self.assertRaises(TemplateSyntaxError):
+            render_template('{% load manifest %}{% manifest_srcset %}')
+        with self.assertRaises(TemplateSyntaxError):
+            render_template(
+                '{% load manifest %}{% manifest_srcset "a.jpg" "b" "c" %}')
+
+
+class PrefetchTests(SimpleTestCase):
+    def setUp(self):
+        _derived_cache.clear()
+        APP_SETTINGS.update({'prefetch_routes': {
+            'shop:cart': ['chunk1.js', 'styles.css'],
+            'shop:*': ['chunk2.js', 'chunk1.js'],
+            'blog:*': ['missing.js'],
+        }})
+
+    def tearDown(self):
+        APP_SETTINGS.update({'prefetch_routes': {}})
+
+    def get_request(self, view_name):
+        request = RequestFactory().get('/')
+        request.resolver_match = mock.Mock(view_name=view_name)
+        return request
+
+    def test_tag_uses_current_route(self):
+        rendered = render_template(
+            '{% load manifest %}{% manifest_prefetch %}',
+            {'request': self.get_request('shop:cart')}
+        )
+        self.assertEqual(
+            rendered,
+            '<link rel="prefetch" href="/static/chunk1.hash.js">\n'
+            '<link rel="prefetch" href="/static/styles.hash.css">\n'
+            '<link rel="prefetch" href="/static/chunk2.hash.js">'
+        )
+
+    def test_tag_with_route(self):
+        self.assertEqual(render_template(
+            '{% load manifest %}{% manifest_prefetch "shop:list" %}'
+        ), '<link rel="prefetch" href="/static/chunk2.hash.js">'
+           '\n<link rel="prefetch" href="/static/chunk1.hash.js">')
+        self.assertEqual(render_template(
+            '{% load manifest %}{% manifest_prefetch "blog:post" %}'
+            '{% manifest_prefetch "home" %}{% manifest_prefetch %}'
+        ), '')
+
+    def test_resolved_once_per_route(self):
+        with mock.patch('manifest_loader.utils._match_urls',
+                        wraps=utils._match_urls) as match_urls:
+            for _ in range(3):
+                manifest_prefetch('shop:cart')
+        # one call per entry of the two matching rules, on the first lookup
+        self.assertEqual(match_urls.call_count, 4)
+
+    def test_middleware(self):
+        def view(request):
+            response = HttpResponse()
+            response['Link'] = '</fonts.css>; rel=preload'
+            return response
+
+        response = prefetch_middleware(view)(self.get_request('shop:list'))
+        self.assertEqual(
+            response['Link'],
+            '</fonts.css>; rel=preload, </static/chunk2.hash.js>; '
+            'rel=prefetch, </static/chunk1.hash.js>; rel=prefetch'
+        )
+        response = prefetch_middleware(HttpResponse)(RequestFactory().get('/'))
+        self.assertFalse(response.has_header('Link'))
+
+
+class ManifestBlockTests(OutputDirMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        _block_cache.clear()
+        _block_namespaces.clear()
+        self.write_manifest({'main.js': 'main.1.js'})
+
+    def tearDown(self):
+        APP_SETTINGS.update({'block_cache': None})
+        super().tearDown()
+
+    def test_rendered_once(self):
+        template = Template(
+            '{% load manifest %}{% manifest_block %}'
+            '<script src="{% manifest "main.js" %}"></script>'
+            '{% endmanifest_block %}')
+        self.assertEqual(template.render(Context()),
+                         '<script src="/static/main.1.js"></script>')
+        with mock.patch('manifest_loader.templatetags.manifest.'
+                        'ManifestNode.render', side_effect=AssertionError):
+            self.assertEqual(template.render(Context()),
+                             '<script src="/static/main.1.js"></script>')
+
+    def test_rendered_again_for_new_version(self):
+        template = Template(
+            '{% load manifest %}{% manifest_block %}'
+            '{% manifest "main.js" %}{% endmanifest_block %}')
+        template.render(Context())
+        self.write_manifest({'main.js': 'main.2.js'})
+        self.assertEqual(template.render(Context()), '/static/main.2.js')
+
+    def test_vary_on_and_autoescape(self):
+        template = Template(
+            '{% load manifest %}{% manifest_block lang %}'
+            '{{ lang }} {% manifest "main.js" %}{% endmanifest_block %}')
+        self.assertEqual(template.render(Context({'lang': 'en'})),
+                         'en /static/main.1.js')
+        self.assertEqual(template.render(Context({'lang': 'fr'})),
+                         'fr /static/main.1.js')
+        self.assertEqual(template.render(Context({'lang': '<b>'})),
+                         '&lt;b&gt; /static/main.1.js')
+        self.assertEqual(
+            template.render(Context({'lang': '<b>'}, autoescape=False)),
+            '<b> /static/main.1.js')
+
+    def test_rendered_again_for_new_lookup_table(self):
+        template = Template(
+            '{% load manifest %}{% manifest_block %}'
+            '{% manifest "main.js" %}{% endmanifest_block %}')
+        path = os.path.join(self.output_dir.name, 'lookup.json')
+        with open(path, 'w') as table_file:
+            json.dump({'keys': {'main.js': '/static/main.1.js'},
+                       'patterns': {}}, table_file)
+        APP_SETTINGS.update({'lookup_table': path})
+        try:
+            self.assertEqual(template.render(Context()), '/static/main.1.js')
+            with open(path, 'w') as table_file:
+                json.dump({'keys': {'main.js': '/static/main.2.js'},
+                           'patterns': {}}, table_file)
+            os.utime(path, ns=(0, 0))
+            self.assertEqual(template.render(Context()), '/static/main.2.js')
+        finally:
+            APP_SETTINGS.update({'lookup_table': None})
+
+    def test_shared_cache(self):
+        APP_SETTINGS.update({'block_cache': 'default'})
+        source = ('{% load manifest %}{% manifest_block %}'
+                  '{% manifest "main.js" %}{% endmanifest_block %}')
+        Template(source).render(Context())
+        _block_cache.clear()
+        _block_namespaces.clear()
+        with mock.patch('manifest_loader.templatetags.manifest.'
+                        'ManifestNode.render', side_effect=AssertionError):
+            # a new template object, as in another process
+            self.assertEqual(Template(source).render(Context()),
+                             '/static/main.1.js')
+
+
+class UrlPrefixTests(SimpleTestCase):
+    def setUp(self):
+        _derived_cache.clear()
+        self.output_dir = tempfile.TemporaryDirectory()
+        with open(os.path.join(self.output_dir.name, 'manifest.json'),
+                  'w') as manifest_file:
+            json.dump({
+                'main.js': 'main.1.js',
+                'font.woff2': 'fonts/font.1.woff2',
+                'hero.jpg': 'media/hero.1.jpg',
+                'logo.png': 'media/logo.1.png',
+                'styles.css': 'styles.1.css',
+            }, manifest_file)
+        self.origins = ['https://a.cdn.test', 'https://b.cdn.test']
+        APP_SETTINGS.update({
+            'output_dir': self.output_dir.name,
+            'url_prefixes': [
+                ('*.woff2', 'https://fonts.static.test/'),
+                ('media/*', self.origins),
+            ],
+        })
+
+    def tearDown(self):
+        APP_SETTINGS.update({'output_dir': None, 'url_prefixes': []})
+        self.output_dir.cleanup()
+
+    def test_rules_applied(self):
+        self.assertEqual(manifest('font.woff2'),
+                         'https://fonts.static.test/static/fonts/font.1.woff2')
+        self.assertEqual(manifest('main.js'), '/static/main.1.js')
+        for key in ('hero.jpg', 'logo.png'):
+            origin = manifest(key).split('/static/')[0]
+            self.assertIn(origin, self.origins)
+
+    def test_hashing_is_stable(self):
+        url = manifest('hero.jpg')
+        _derived_cache.clear()
+        APP_SETTINGS.update({'url_prefixes': [
+            ('media/*', list(reversed(self.origins)))]})
+        self.assertEqual(manifest('hero.jpg'), url)
+
+    def test_list_of_patterns(self):
+        APP_SETTINGS.update({'url_prefixes': [
+            (['*.woff2', '*.css'], 'https://fonts.static.test')]})
+        self.assertEqual(manifest('styles.css'),
+                         'https://fonts.static.test/static/styles.1.css')
+        self.assertEqual(manifest('main.js'), '/static/main.1.js')
+
+    def test_resolved_once(self):
+        manifest('font.woff2')
+        with mock.patch('manifest_loader.utils._resolve_url',
+                        side_effect=AssertionError):
+            for _ in range(3):
+                manifest('font.woff2')
+
+    def test_preconnect(self):
+        used = {manifest('hero.jpg').split('/static/')[0],
+                manifest('logo.png').split('/static/')[0]}
+        expected = ['<link rel="preconnect" '
+                    'href="https://fonts.static.test" crossorigin>']
+        expected += ['<link rel="preconnect" href="{}">'.format(origin)
+                     for origin in self.origins if origin in used]
+        self.assertEqual(
+            render_template('{% load manifest %}{% manifest_preconnect %}'),
+            '\n'.join(expected))
+
+
+class InstrumentationTests(SimpleTestCase):
+    def test_hooks_receive_phase_timings(self):
+        events = []
+
+        def hook(kind, name, value):
+            events.append((kind, name))
+
+        instrumentation.add_hook(hook)
+        try:
+            manifest('main.js')
+        finally:
+            instrumentation.remove_hook(hook)
+        self.assertEqual(events, [('timing', 'load'), ('timing', 'match'),
+                                  ('timing', 'resolve'),
+                                  ('timing', 'escape')])
+
+
+class BenchCommandTests(SimpleTestCase):
+    def test_reports_percentiles(self):
+        out = io.StringIO()
+        call_command('manifest_bench', '--tags', '10', '-n', '20',
+                     '--threads', '2', stdout=out)
+        results = json.loads(out.getvalue())
+        for run in ('cold', 'warm'):
+            self.assertEqual(results[run]['latency_ms']['count'], 20)
+            self.assertEqual(set(results[run]['phases_ms']),
+                             {'load', 'match', 'resolve', 'escape'})
+        self.assertLessEqual(results['warm']['latency_ms']['p50'],
+                             results['warm']['latency_ms']['p99'])
+
+    def test_clear_caches(self):
+        APP_SETTINGS.update({'manifests': {
+            'checkout': {'manifest_file': 'url_manifest.json', 'cache': True},
+        }, 'manual_reload': True})
+        try:
+            Template('{% load manifest %}{% manifest_block %}'
+                     '{% manifest "main.js" %}'
+                     '{% manifest "checkout:main.js" %}'
+                     '{% endmanifest_block %}').render(Context())
+            self.assertIsNotNone(cache.get('webpack_manifest:checkout'))
+            clear_caches()
+            for lru in _CACHES:
+                self.assertEqual(lru.items(), [])
+            self.assertIsNone(cache.get('webpack_manifest:checkout'))
+            self.assertIsNone(cache.get('webpack_manifest:checkout_version'))
+        finally:
+            APP_SETTINGS.update({'manifests': {}, 'manual_reload': False})
+            clear_caches()
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([5], 95), 5)
+
+
+class MemoryTests(SimpleTestCase):
+    def test_deep_sizeof(self):
+        shared = ['x' * 1000]
+        self.assertGreater(deep_sizeof({'a': shared}), 1000)
+        seen = set()
+        deep_sizeof(shared, seen)
+        self.assertLess(deep_sizeof({'a': shared}, seen), 1000)
+
+    def test_memory_report(self):
+        report = memory_report()['default']
+        self.assertEqual(report['disk_bytes'],
+                         os.path.getsize(settings.BASE_DIR / 'dist' /
+                                         'manifest.json'))
+        for section in ('manifest', 'urls', 'indexes', 'fragments'):
+            self.assertGreater(report[section + '_bytes'], 0)
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_memory_report_restores_caches(self):
+        manifest('main.js')
+        loaded = _loaded.items()
+        derived = _derived_cache.items()
+        memory_report()
+        self.assertEqual(_loaded.items(), loaded)
+        self.assertEqual(_derived_cache.items(), derived)
+
+    def test_footprint_includes_blocks(self):
+        _block_cache.clear()
+        before = footprint()['fragments']
+        _block_cache.set(('block',), 'x' * 1000, 1000)
+        try:
+            self.assertGreater(footprint()['fragments'], before + 1000)
+        finally:
+            _block_cache.clear()
+
+    def test_gauges_on_reload(self):
+        events = {}
+
+        def hook(kind, name, value):
+            if kind == 'gauge':
+                events[name] = value
+
+        manifest('main.js')
+        instrumentation.add_hook(hook)
+        try:
+            manifest_changed.send(sender=None, cache_key='webpack_manifest',
+                                  old_version='a', new_version='b',
+                                  added=set(), removed=set(), changed=set())
+        finally:
+            instrumentation.remove_hook(hook)
+        self.assertEqual(set(events), {
+            'memory.manifest', 'memory.urls', 'memory.indexes',
+            'memory.fragments', 'memory.misses', 'memory.disk'})
+        self.assertGreater(events['memory.manifest'], 0)
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('manifest_memory', '--namespace', 'default', stdout=out)
+        self.assertIn('total_bytes', json.loads(out.getvalue())['default'])
+
+
+class ManualReloadTests(OutputDirMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        _loaded.clear()
+        self.write_manifest({'main.js': 'main.1.js', 'vendor.js': 'v.1.js'})
+        APP_SETTINGS.update({'manual_reload': True})
+
+    def tearDown(self):
+        APP_SETTINGS.update({'manual_reload': False})
+        _pinned.clear()
+        super().tearDown()
+
+    def test_swapped_on_reload_only(self):
+        self.assertEqual(manifest('main.js'), '/static/main.1.js')
+        old_version = manifest_version()
+        self.write_manifest({'main.js': 'main.2.js', 'vendor.js': 'v.1.js'})
+        self.assertEqual(manifest('main.js'), '/static/main.1.js')
+
+        versions = reload_manifests()
+        self.assertEqual(versions['webpack_manifest'],
+                         (old_version, manifest_version()))
+        self.assertNotEqual(old_version, manifest_version())
+        self.assertEqual(manifest('main.js'), '/static/main.2.js')
+
+    def test_prewarmed_before_swap(self):
+        manifest_match('*.js', '{match}')
+        manifest_importmap()
+        self.write_manifest({'main.js': 'main.2.js', 'vendor.js': 'v.2.js'})
+        reload_manifests()
+
+        with mock.patch('manifest_loader.utils._load_from_manifest',
+                        side_effect=AssertionError), \
+                mock.patch('manifest_loader.utils._importmap_json',
+                           side_effect=AssertionError):
+            self.assertEqual(manifest_match('*.js', '{match}'),
+                             '/static/main.2.js\n/static/v.2.js')
+            self.assertIn('/static/v.2.js', manifest_importmap())
+            self.assertEqual(ManifestAssets()['vendor.js'], '/static/v.2.js')
+
+    def test_pinned_manifests_are_bounded(self):
+        for tenant in range(4):
+            with open(os.path.join(self.output_dir.name,
+                                   'tenant{}.json'.format(tenant)),
+                      'w') as manifest_file:
+                json.dump({'main.js': 'main.{}.js'.format(tenant)},
+                          manifest_file)
+        APP_SETTINGS.update({'resolver': lambda context, namespace: {
+            'manifest_file': 'tenant{}.json'.format(context['tenant'])}
+            if context is not None else None})
+        _pinned.maxsize, maxsize = 2, _pinned.maxsize
+        try:
+            for tenant in range(4):
+                self.assertEqual(
+                    manifest('main.js', Context({'tenant': tenant})),
+                    '/static/main.{}.js'.format(tenant))
+            self.assertEqual(len(_pinned), 2)
+            self.assertEqual(len(reload_manifests()), 3)
+        finally:
+            _pinned.maxsize = maxsize
+            APP_SETTINGS.update({'resolver': None})
+
+    def test_signal_handler(self):
+        reloaded = threading.Event()
+        previous = signal.getsignal(signal.SIGUSR2)
+        try:
+            install_signal_handlers(['SIGUSR2'])
+            with mock.patch('manifest_loader.reload.reload_manifests',
+                            side_effect=reloaded.set):
+                call_command('manifest_reload', '--pid', str(os.getpid()),
+                             '--signal', 'SIGUSR2', stdout=io.StringIO())
+                self.assertTrue(reloaded.wait(5))
+        finally:
+            signal.signal(signal.SIGUSR2, previous)
+
+    def test_command_errors(self):
+        with self.assertRaises(CommandError):
+            call_command('manifest_reload', '--signal', 'SIGFOO')
+        with self.assertRaises(CommandError):
+            call_command('manifest_reload', '--pidfile',
+                         os.path.join(self.output_dir.name, 'missing.pid'))
+
+
+class BudgetCommandTests(SimpleTestCase):
+    def tearDown(self):
+        APP_SETTINGS.update({'output_dir': None, 'budgets': {}})
+
+    def test_sizes_within_budget(self):
+        APP_SETTINGS.update({'budgets': {'*.js': '1KB', '*': 1000}})
+        out = io.StringIO()
+        with tempfile.TemporaryDirectory() as output_dir:
+            path = os.path.join(output_dir, 'report.json')
+            call_command('manifest_budget', '--compressed', '-o', path,
+                         stdout=out)
+            with open(path) as report_file:
+                report = {row['name']: row for row in json.load(report_file)}
+        self.assertEqual(report['main.js']['sizes']['size'], 983)
+        self.assertEqual(report['main.js']['budget'], 1000)
+        self.assertIn('gzip', report['styles.css']['sizes'])
+        self.assertIn('styles.css', out.getvalue())
+
+    def test_over_budget(self):
+        out = io.StringIO()
+        with self.assertRaisesMessage(CommandError, 'styles.css'):
+            call_command('manifest_budget', '--budget', '*.css=10B',
+                         '--workers', '0', stdout=out)
+        self.assertIn('OVER', out.getvalue())
+
+    def test_entrypoints(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            with open(os.path.join(output_dir, 'manifest.json'),
+                      'w') as manifest_file:
+                json.dump({
+                    'main.js': 'main.e12dfe2f9b185dea03a4.js',
+                    'entrypoints': {
+                        'main': ['main.e12dfe2f9b185dea03a4.js',
+                                 'chunk1.hash.js'],
+                        'app': {'assets': {'js': ['chunk2.hash.js'],
+                                           'css': ['styles.hash.css']}},
+                    },
+                }, manifest_file)
+            APP_SETTINGS.update({'output_dir': output_dir})
+            out = io.StringIO()
+            with self.assertRaisesMessage(CommandError, 'app'):
+                call_command('manifest_budget', '--entrypoints',
+                             '--budget', 'main=2KB', '--budget', 'app=10',
+                             '--workers', '0', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[1].split()[:4], ['main', '2', '983', 'B'])
+        self.assertEqual(lines[2].split()[:4], ['app', '2', '16', 'B'])
+
+    def test_parse_size(self):
+        self.assertEqual(parse_size(100), 100)
+        self.assertEqual(parse_size('250KB'), 250 * 1024)
+        self.assertEqual(parse_size('1.5 MiB'), 1536 * 1024)
+        with self.assertRaises(ValueError):
+            parse_size('lots')
+
+    def test_invalid_budget(self):
+        for budget in ('250KB', '*.js=lots', '=250KB'):
+            with self.assertRaisesMessage(CommandError, 'Invalid budget'):
+                call_command('manifest_budget', '--budget', budget,
+                             stdout=io.StringIO())
+
+
+class IncrementalReloadTests(OutputDirMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        _loaded.clear()
+        self.write_manifest({'main.js': 'main.1.js',
+                             'vendor.js': 'vendor.1.js',
+                             'styles.css': 'styles.1.css'})
+        self.diffs = []
+        manifest_changed.connect(self.receiver)
+
+    def tearDown(self):
+        manifest_changed.disconnect(self.receiver)
+        super().tearDown()
+
+    def receiver(self, **kwargs):
+        self.diffs.append(kwargs)
+
+    def test_only_affected_values_rebuilt(self):
+        mapping = ManifestAssets()
+        mapping['vendor.js']
+        manifest_match('*.css', '{match}')
+        manifest_match('main*', '{match}')
+        self.write_manifest({'main.js': 'main.2.js',
+                             'vendor.js': 'vendor.1.js',
+                             'styles.css': 'styles.1.css'})
+
+        with mock.patch.object(DefaultLoader, 'get_multi_match',
+                               wraps=DefaultLoader.get_multi_match) as match:
+            self.assertEqual(manifest_match('*.css', '{match}'),
+                             '/static/styles.1.css')
+            self.assertEqual(match.call_count, 0)
+            self.assertEqual(manifest_match('main*', '{match}'),
+                             '/static/main.2.js')
+            self.assertEqual(match.call_count, 1)
+
+        new_version = self.diffs[0]['new_version']
+        urls = [value for key, value, nbytes in _derived_cache.items()
+                if key[0] == 'urls' and key[2] == new_version]
+        self.assertEqual(urls, [{'vendor.js': '/static/vendor.1.js'}])
+
+    def test_signal_reports_diff(self):
+        manifest('main.js')
+        self.write_manifest({'main.js': 'main.2.js', 'app.js': 'app.1.js',
+                             'styles.css': 'styles.1.css'})
+        manifest('main.js')
+        self.assertEqual(len(self.diffs), 1)
+        self.assertEqual(self.diffs[0]['added'], {'app.js'})
+        self.assertEqual(self.diffs[0]['removed'], {'vendor.js'})
+        self.assertEqual(self.diffs[0]['changed'], {'main.js'})
+
+    def test_tracked_manifests_are_bounded(self):
+        for tenant in range(5):
+            with open(os.path.join(self.output_dir.name,
+                                   'tenant{}.json'.format(tenant)),
+                      'w') as manifest_file:
+                json.dump({'main.js': 'main.{}.js'.format(tenant)},
+                          manifest_file)
+        APP_SETTINGS.update({'resolver': lambda context, namespace: {
+            'manifest_file': 'tenant{}.json'.format(context['tenant'])}})
+        _loaded.maxsize, maxsize = 2, _loaded.maxsize
+        try:
+            for tenant in range(5):
+                self.assertEqual(manifest('main.js',
+                                          Context({'tenant': tenant})),
+                                 '/static/main.{}.js'.format(tenant))
+        finally:
+            _loaded.maxsize = maxsize
+            APP_SETTINGS.update({'resolver': None})
+        self.assertEqual(len(_loaded), 2)
+        self.assertGreater(_loaded.nbytes, 0)